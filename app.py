@@ -1,22 +1,30 @@
 from __future__ import annotations
-import os, time
+import json, os, time
 import streamlit as st
 
 from core.config import (
-    APP_TITLE, ensure_dirs, load_env, VS_BASE, UPLOAD_DIR,
-    LOW_CONFIDENCE_THRESH, TOPK_DENSE, TOPK_FINAL, collection_id_from_file_infos
+    APP_TITLE, ensure_dirs, load_env, VS_BASE,
+    LOW_CONFIDENCE_THRESH, TOPK_DENSE, TOPK_FINAL, SUMMARY_LLM_COMPACTION, WARMUP_ON_START,
+    collection_id_from_blobs
+)
+# Heavy modules (faiss, numpy, google.generativeai, rank_bm25, fitz) load lazily via
+# core.runtime or local imports so the first page paints before they are needed.
+from core import runtime
+from core.scheduler import BULK, priority_class, get_scheduler
+from core.storage import (
+    store_upload, write_manifest, read_manifest, manifest_files, disk_usage, total_usage,
+    gc_orphans, enforce_quota
 )
-# NOTE: page preview removed — no import from pdf_utils
-from core.embeddings import GeminiEmbedder
-from core.vector_store import VectorStore
-from core.llm import GeminiLLM
 from core.retrieval import (
-    is_generic_query, make_context, build_prompt, add_inline_citations, minimal_extractive_fallback
+    make_context, build_prompt, build_summary_prompt, add_inline_citations,
+    minimal_extractive_fallback, extractive_answer
 )
+from core.router import GENERAL, EXTRACTIVE, route_query, record_outcome
 from core.formatting import prettify_answer
 from core.history import (
     list_threads, create_thread, get_thread, set_thread_title, set_thread_collection,
-    append_message, update_thread_title_if_empty, conversation_summary_for_prompt
+    append_message, update_thread_title_if_empty, conversation_summary_for_prompt,
+    set_summary_compactor
 )
 
 # ---------- helpers ----------
@@ -58,6 +66,21 @@ def message_card(role: str, content: str):
     st.markdown("<div style='height:8px'></div>", unsafe_allow_html=True)
 
 
+@st.experimental_fragment(run_every=1.5)
+def ingest_progress(collection_id: str):
+    """Poll the background ingestion job; rerun the page once the index is ready."""
+    job = runtime.get_job_queue().status(collection_id) or {"state": "done"}
+    if job["state"] in ("done", "failed"):
+        st.rerun()
+    total, done = job.get("batches_total") or 0, job.get("batches_done") or 0
+    if job["state"] == "queued":
+        st.progress(0.0, text="Queued for indexing…")
+    elif not total:
+        st.progress(0.0, text="Extracting text & chunking…")
+    else:
+        st.progress(done / total, text=f"Embedding batch {done}/{total}…")
+
+
 # ---------- app ----------
 def main():
     st.set_page_config(page_title=APP_TITLE, page_icon="📚", layout="wide")
@@ -68,6 +91,17 @@ def main():
     except RuntimeError as e:
         st.error(str(e)); st.stop()
 
+    if WARMUP_ON_START:
+        runtime.start_warmup()
+
+    if SUMMARY_LLM_COMPACTION:
+        def compact_summary(turns: str) -> str:
+            from core.llm import GeminiLLM
+            with priority_class(BULK):
+                return GeminiLLM(cfg["GEMINI_MODEL"]).generate(build_summary_prompt(turns))
+
+        set_summary_compactor(compact_summary)
+
     # Global CSS
     st.markdown(
         """
@@ -110,13 +144,6 @@ h2 { margin-top: 2rem !important; padding-top: 1rem !important; }
         st.session_state.setdefault("last_sources", [])
         st.session_state.setdefault("last_sources_tid", None)
 
-    # Embedder (cached)
-    @st.cache_resource(show_spinner=False)
-    def get_embedder():
-        return GeminiEmbedder()
-
-    embedder = get_embedder()
-
     # ---------- Sidebar: topics ----------
     with st.sidebar:
         st.subheader("📁 Chats")
@@ -156,6 +183,40 @@ h2 { margin-top: 2rem !important; padding-top: 1rem !important; }
                     if cancel:
                         st.session_state["rename_open_tid"] = None; st.rerun()
 
+        api_stats = get_scheduler().stats()
+        if api_stats:
+            with st.expander("⏱ Gemini API queue"):
+                for model, m in api_stats.items():
+                    depth = m["queue_depth"]
+                    st.caption(
+                        f"**{model}** · queued {depth['interactive']} interactive / {depth['bulk']} bulk · "
+                        f"in flight {m['inflight']}/{m['concurrency_limit']} · "
+                        f"avg wait {m['wait_avg_s']}s (max {m['wait_max_s']}s) · throttled {m['throttled']}"
+                    )
+
+        with st.expander("💾 Storage"):
+            # Walking the index, blob and page-cache folders is slow; only do it on request.
+            refresh = st.button("Show disk usage", use_container_width=True)
+            if st.button("Clean up storage", use_container_width=True):
+                removed = gc_orphans()
+                evicted = enforce_quota()
+                st.toast(
+                    f"Removed {removed['collections']} orphaned collection(s), {removed['blobs']} file(s); "
+                    f"evicted {len(evicted)} cold collection(s)."
+                )
+                refresh = refresh or "storage_report" in st.session_state
+            if refresh:
+                st.session_state["storage_report"] = (total_usage(), disk_usage())
+            if "storage_report" in st.session_state:
+                total, usage = st.session_state["storage_report"]
+                st.caption(f"Total on disk: {total / 2**20:.1f} MB")
+                for u in usage:
+                    state = "indexed" if u["indexed"] else "not indexed"
+                    st.caption(
+                        f"`{u['collection_id']}` · {(u['index_bytes'] + u['blob_bytes']) / 2**20:.1f} MB · "
+                        f"{u['refs']} topic(s) · {state}"
+                    )
+
     # ---------- Layout ----------
     left, right = st.columns([0.66, 0.34], gap="large")
 
@@ -176,61 +237,61 @@ h2 { margin-top: 2rem !important; padding-top: 1rem !important; }
 
         if uploads and tid:
             try:
-                file_infos, files_bytes = [], []
+                blobs = []
                 for up in uploads:
-                    data = up.read()
-                    with open(os.path.join(UPLOAD_DIR, up.name), "wb") as f:
-                        f.write(data)
-                    file_infos.append((up.name, len(data)))
-                    files_bytes.append((up.name, data))
+                    digest, _ = store_upload(up.name, up.read())
+                    blobs.append((up.name, digest))
 
-                collection_id = collection_id_from_file_infos(file_infos)
+                collection_id = collection_id_from_blobs(blobs)
+                write_manifest(collection_id, blobs)
                 set_thread_collection(tid, collection_id)
-                vs_folder = os.path.join(VS_BASE, collection_id)
-
-                vs = VectorStore(embedder)
-                idx_path = os.path.join(vs_folder, "index.faiss")
-                meta_path = os.path.join(vs_folder, "meta.json")
-
-                with st.status("Indexing your documents…", expanded=True) as s:
-                    if os.path.exists(idx_path) and os.path.exists(meta_path):
-                        s.write("Loading cached vector index…")
-                        vs.load(vs_folder)
-                    else:
-                        s.write("Extracting text & chunking…")
-                        from core.pdf_utils import build_chunks  # local import to avoid confusion
-                        chunks = build_chunks(files_bytes)
-                        if not chunks:
-                            st.error("No text extracted from PDFs.")
-                            s.update(label="Failed to index", state="error")
-                            return
-                        s.write("Embedding & building FAISS…")
-                        vs.build(chunks)
-                        s.write("Saving index for reuse…")
-                        vs.save(vs_folder)
-                    s.update(label="Documents processed ✅", state="complete", expanded=False)
-
-                st.toast("Documents processed ✅")
+                job = runtime.get_job_queue().submit(collection_id, manifest_files(collection_id))
+                if job["state"] == "done":
+                    st.toast("Documents processed ✅")
+                else:
+                    st.toast("Indexing started in the background…")
             finally:
                 st.session_state[nonce_key] = nonce + 1
                 st.rerun()
 
+        job = None
+        if active_collection and not runtime.collection_ready(active_collection):
+            jobs = runtime.get_job_queue()
+            job = jobs.status(active_collection)
+            if (job is None or job["state"] == "done") and read_manifest(active_collection):
+                # index was evicted to stay under the disk quota; rebuild from stored uploads
+                job = jobs.submit(active_collection, manifest_files(active_collection))
+        if job and job["state"] in ("queued", "running"):
+            ingest_progress(active_collection)
+        elif job and job["state"] == "failed":
+            st.error(f"Indexing failed: {job['error']}")
+            if st.button("Retry indexing"):  # resumes from the last saved batch
+                runtime.get_job_queue().submit(active_collection, manifest_files(active_collection))
+                st.rerun()
+
         if active_collection:
             vs_folder = os.path.join(VS_BASE, active_collection)
-            if os.path.exists(os.path.join(vs_folder, "meta.json")):
-                tmp_vs = VectorStore(embedder); tmp_vs.load(vs_folder)
+            if runtime.collection_ready(active_collection):
+                tmp_vs = runtime.load_collection(active_collection)
                 by_doc: dict[str, set[int]] = {}
                 for m in tmp_vs.meta.values():
                     by_doc.setdefault(m["doc"], set()).add(int(m["page"]))
                 for doc, pages in by_doc.items():
                     st.write(f"- **{doc}** · {len(pages)} pages indexed")
+                report_path = os.path.join(vs_folder, "ingest_report.json")
+                if os.path.exists(report_path):
+                    with open(report_path, "r", encoding="utf-8") as f:
+                        dedup = json.load(f).get("dedup") or {}
+                    if dedup.get("removed"):
+                        st.caption(
+                            f"Collapsed {dedup['removed']} of {dedup['total']} chunks as near-duplicates "
+                            f"({dedup['embedding_calls_saved']} embedding calls saved)."
+                        )
             else:
                 st.caption("No documents indexed for this topic yet.")
         else:
             st.caption("No documents indexed for this topic yet.")
 
-        # Page preview REMOVED as requested
-
     # ---------- Left: chat ----------
     with left:
         st.subheader("💬 Chat")
@@ -244,11 +305,20 @@ h2 { margin-top: 2rem !important; padding-top: 1rem !important; }
         else:
             st.caption("This topic is empty. Ask the first question to begin.")
 
-        # Sources (no preview buttons)
+        # Sources (page renders are prefetched while the answer is generated)
         if st.session_state.get("last_sources_tid") == tid and st.session_state.get("last_sources"):
             with st.expander("Sources (pages / documents)"):
                 for m in st.session_state["last_sources"]:
                     st.write(f"- **{m['doc']}** (page {m['page']}) · score={m['score']}")
+                    also = ", ".join(
+                        f"{d} p.{p}" for d, p in m.get("occurrences") or [] if (d, p) != (m["doc"], m["page"])
+                    )
+                    if also:
+                        st.caption(f"Also appears on: {also}")
+                    from core.pdf_utils import render_pdf_page_image
+                    png = render_pdf_page_image(m["doc"], int(m["page"]), collection_id=thread["collection_id"])
+                    if png:
+                        st.image(png, use_column_width=True)
             st.session_state["last_sources"] = []
             st.session_state["last_sources_tid"] = None
 
@@ -268,42 +338,52 @@ h2 { margin-top: 2rem !important; padding-top: 1rem !important; }
             active = get_thread(tid)
             collection_id = active["collection_id"] if active else None
             if collection_id:
-                vs_folder = os.path.join(VS_BASE, collection_id)
-                if os.path.exists(os.path.join(vs_folder, "meta.json")):
-                    @st.cache_resource(show_spinner=False)
-                    def load_vs_cached(path: str):
-                        v = VectorStore(embedder); v.load(path); return v
-                    vs = load_vs_cached(vs_folder)
+                vs = runtime.load_collection(collection_id)
 
-            generic = is_generic_query(user_q)
-            use_general = generic
+            # Local routing decides grounded / general / extractive before any remote call
+            decision = route_query(user_q, vs)
+            use_general = decision.route == GENERAL
+            top_dense = None; fused = []
 
-            if (not generic) and vs is not None:
+            if (not use_general) and vs is not None:
                 with st.status("🔎 Searching your documents…", expanded=True) as s:
                     s.write("Hybrid search • BM25 + dense")
                     fused = vs.search_hybrid(user_q, topk_dense=TOPK_DENSE, final_k=TOPK_FINAL)
-                    top_dense = vs.top_dense_score(user_q)
+                    top_dense = vs.top_dense_score(user_q)  # query embedding is cached by search_hybrid
                     context_block, pages, source_meta = make_context(fused, vs.meta)
+                    from core.pdf_utils import prefetch_pages
+                    prefetch_pages(source_meta, collection_id=collection_id)
                     s.update(label="Search complete ✅", state="complete", expanded=False)
                 use_general = (top_dense < LOW_CONFIDENCE_THRESH) or (len(source_meta) == 0)
 
-            prompt = build_prompt(user_q, conv_summary, context_block, general=use_general)
-            llm = GeminiLLM(cfg["GEMINI_MODEL"])
-
-            with st.status("💡 Generating answer…", expanded=False):
-                raw = llm.generate(prompt)
-
-            if raw.startswith("__LLM_ERROR__"):
-                if (not use_general) and vs is not None and source_meta:
-                    final = minimal_extractive_fallback([(list(vs.meta.keys())[0], 0.0)], vs.meta)
-                else:
-                    final = "Sorry, I couldn't generate an answer right now."
+            if decision.route == EXTRACTIVE and (not use_general):
+                final = extractive_answer(fused, vs.meta)
+                outcome = "extractive"
             else:
-                final = raw.strip()
-                if (not use_general) and ("Not found in the document" in final or len(final) < 4):
-                    alt = llm.generate(build_prompt(user_q, conv_summary, context_block, general=True))
-                    if not alt.startswith("__LLM_ERROR__"):
-                        final = alt.strip(); pages = []
+                prompt = build_prompt(user_q, conv_summary, context_block, general=use_general)
+                from core.llm import GeminiLLM
+                llm = GeminiLLM(cfg["GEMINI_MODEL"])
+
+                with st.status("💡 Generating answer…", expanded=False):
+                    raw = llm.generate(prompt)
+
+                outcome = "general" if use_general else "grounded_answered"
+                if decision.route != GENERAL and use_general:
+                    outcome = "grounded_low_confidence"
+                if raw.startswith("__LLM_ERROR__"):
+                    outcome = "llm_error"
+                    if (not use_general) and vs is not None and source_meta:
+                        final = minimal_extractive_fallback([(list(vs.meta.keys())[0], 0.0)], vs.meta)
+                    else:
+                        final = "Sorry, I couldn't generate an answer right now."
+                else:
+                    final = raw.strip()
+                    if (not use_general) and ("Not found in the document" in final or len(final) < 4):
+                        outcome = "grounded_not_found"
+                        alt = llm.generate(build_prompt(user_q, conv_summary, context_block, general=True))
+                        if not alt.startswith("__LLM_ERROR__"):
+                            final = alt.strip(); pages = []
+            record_outcome(decision, outcome, top_dense=top_dense, n_sources=len(source_meta))
 
             if (not use_general) and pages:
                 final = add_inline_citations(final, pages)
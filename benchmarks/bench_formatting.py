@@ -0,0 +1,65 @@
+"""Answer formatter benchmark on long synthetic answers.
+
+Run from the repo root:  python benchmarks/bench_formatting.py [--repeat 5] [--chunk 64]
+
+"legacy" is the formatter before the single-pass rewrite (legacy_formatting.py);
+"prettify" formats a complete answer with core.formatting; "streamed" feeds the same
+answer to StreamingFormatter in --chunk sized pieces and includes finish().
+"""
+from __future__ import annotations
+import argparse, os, sys, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.formatting import StreamingFormatter, prettify_answer  # noqa: E402
+from legacy_formatting import prettify_answer as legacy_prettify_answer  # noqa: E402
+
+def numbered_answer(items: int) -> str:
+    parts = ["Here are the **key points** from the handbook :"]
+    for i in range(1, items + 1):
+        parts.append(
+            f"{i}. **Rule {i}**: students must register ; fees (tuition, hostel ; library) are due ,"
+            f"late fees apply .. see section {i} (page {i % 40 + 1}) ; appeals go to the registrar"
+        )
+    return "\n".join(parts)
+
+def paragraph_answer(sentences: int) -> str:
+    return " ".join(
+        f"Clause {i} (which covers items a; b; c) applies to   all students;the office , may waive it.."
+        for i in range(sentences)
+    )
+
+CASES = {
+    "numbered, 50 items": numbered_answer(50),
+    "numbered, 500 items": numbered_answer(500),
+    "paragraph, 2k clauses": "1. " + paragraph_answer(2000),
+    "bullets, 1k items": " * ".join(f"point {i} ; detail , more" for i in range(1000)),
+}
+
+def stream(text: str, chunk: int) -> str:
+    fmt = StreamingFormatter()
+    for i in range(0, len(text), chunk):
+        fmt.feed(text[i:i + chunk])
+    return fmt.finish()
+
+def best_ms(fn, number: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--chunk", type=int, default=64)
+    args = ap.parse_args()
+    print(f"{'case':>22} {'size':>12}  {'legacy':>11}  {'prettify':>11}  {'speedup':>7}  {'streamed':>11}")
+    for name, text in CASES.items():
+        assert prettify_answer(text) == legacy_prettify_answer(text) == stream(text, args.chunk), name
+        number = max(1, 20000 // len(text))
+        legacy = best_ms(lambda: legacy_prettify_answer(text), number, args.repeat)
+        once = best_ms(lambda: prettify_answer(text), number, args.repeat)
+        streamed = best_ms(lambda: stream(text, args.chunk), number, args.repeat)
+        print(
+            f"{name:>22} ({len(text) / 1024:6.1f} KiB)  {legacy:8.3f} ms  {once:8.3f} ms  "
+            f"{legacy / once:6.1f}x  {streamed:8.3f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Cold-start benchmark: module import time and time to the first rendered page.
+
+Run from the repo root:  python benchmarks/bench_startup.py [--runs 5]
+Each sample runs in a fresh interpreter so nothing is cached in sys.modules.
+"""
+from __future__ import annotations
+import argparse, os, statistics, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import app
+print(time.perf_counter() - t)
+"""
+
+# AppTest executes app.py the way `streamlit run` does, minus the browser.
+RENDER_SNIPPET = """
+import os, time
+os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=120).run()
+assert any("UniMate" in m.value for m in at.markdown), "title not rendered"
+print(time.perf_counter() - t)
+"""
+
+def _sample(snippet: str) -> float:
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    for label, snippet in (("import app", IMPORT_SNIPPET), ("first render", RENDER_SNIPPET)):
+        samples = [_sample(snippet) for _ in range(args.runs)]
+        print(f"{label:>12}: median {statistics.median(samples) * 1000:8.1f} ms  "
+              f"(min {min(samples) * 1000:.1f}, max {max(samples) * 1000:.1f}, n={args.runs})")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@ from __future__ import annotations
 import os
 import hashlib
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # App
 APP_TITLE = "UniMate – AI University Assistant"
@@ -12,6 +11,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 VS_BASE = os.path.join(BASE_DIR, "backend", "vector_store")
 HIST_BASE = os.path.join(BASE_DIR, "backend", "history")
 UPLOAD_DIR = os.path.join(BASE_DIR, "data", "uploaded_files")
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")  # uploads stored by content hash
+PAGE_CACHE_DIR = os.path.join(BASE_DIR, "backend", "page_cache")
 
 # Models / constants
 EMB_MODEL_NAME = "models/text-embedding-004"
@@ -20,13 +21,46 @@ TOPK_DENSE = 20
 TOPK_FINAL = 5
 LOW_CONFIDENCE_THRESH = 0.25
 MAX_SESSION_SUMMARY_TURNS = 10
+SUMMARY_TOKEN_BUDGET = 400          # rolling conversation summary cap (approx. tokens)
+SUMMARY_SNIPPET_CHARS = 240         # per-message snippet kept in the recent window
+SUMMARY_EARLIER_CHARS = 80          # per-message snippet once folded into "earlier"
+SUMMARY_LLM_COMPACTION = True       # compact folded turns with the LLM in the background
+SUMMARY_COMPACT_TRIGGER = 150       # compact once not-yet-compacted folded turns exceed this (approx. tokens)
+SUMMARY_COMPACT_TOKENS = 100        # cap on the compacted "earlier" text (approx. tokens)
 DENSE_WEIGHT = 0.6
 BM25_WEIGHT = 0.4
+# Gemini request scheduler (process-wide; see core/scheduler.py)
+SCHED_RPM = {EMB_MODEL_NAME: 1500}  # requests/minute per model
+SCHED_DEFAULT_RPM = 60
+SCHED_MAX_CONCURRENCY = 8           # per model; halved on 429/5xx, regrown on success
+SCHED_MAX_RETRIES = 3
+SCHED_BACKOFF_S = 1.0
+DEDUP_ENABLED = True                # collapse near-duplicate chunks (headers, footers, boilerplate)
+DEDUP_THRESHOLD = 0.97              # estimated Jaccard similarity of word shingles (numbers must also match)
+DEDUP_SHINGLE_WORDS = 5
+DEDUP_NUM_PERM = 64                 # MinHash permutations (DEDUP_BANDS * rows per band)
+DEDUP_BANDS = 16
+WARMUP_ON_START = True              # preload recent collections in the background at startup
+WARMUP_COLLECTIONS = 3
+VS_CACHE_SIZE = 8                   # loaded VectorStores kept in memory (process-wide)
+QUERY_CACHE_SIZE = 256              # query embeddings kept per loaded collection
+# Local query router (core/router.py); tune offline from ROUTER_LOG_PATH
+ROUTER_MIN_COVERAGE = 0.25          # below: no query terms in the collection -> general answer
+ROUTER_GENERIC_COVERAGE = 0.6       # generic-looking queries need this much coverage to stay grounded
+ROUTER_EXTRACTIVE_SCORE = 0.9       # cached nearest-chunk score above which the excerpt is returned as-is
+ROUTER_EXTRACTIVE_ENABLED = False   # experimental; candidates are only logged until outcomes justify it
+INGEST_BATCH_SIZE = 32              # chunks embedded per checkpointed batch
+INGEST_WORKERS = 1                  # background ingestion threads
+STORAGE_QUOTA_MB = 2048             # VS_BASE + BLOB_DIR + PAGE_CACHE_DIR; LRU eviction above this
+STORAGE_GRACE_S = 3600              # never GC/evict anything used more recently than this
+PDF_HANDLE_POOL_SIZE = 8            # open fitz documents kept for page rendering
+PAGE_CACHE_MEM_ITEMS = 64           # rendered page PNGs kept in memory
 
 THREADS_PATH = os.path.join(HIST_BASE, "threads.json")
+ROUTER_LOG_PATH = os.path.join(HIST_BASE, "router_log.jsonl")
 
 def ensure_dirs() -> None:
-    for p in (VS_BASE, HIST_BASE, UPLOAD_DIR):
+    for p in (VS_BASE, HIST_BASE, UPLOAD_DIR, BLOB_DIR, PAGE_CACHE_DIR):
         os.makedirs(p, exist_ok=True)
 
 def load_env() -> dict:
@@ -34,16 +68,29 @@ def load_env() -> dict:
     api_key = os.getenv("GOOGLE_API_KEY", "").strip()
     if not api_key:
         raise RuntimeError("Missing GOOGLE_API_KEY in .env")
-    genai.configure(api_key=api_key)
     return {
         "GOOGLE_API_KEY": api_key,
         "GEMINI_MODEL": os.getenv("GEMINI_MODEL", GEMINI_DEFAULT),
     }
 
-def collection_id_from_file_infos(file_infos: list[tuple[str, int]]) -> str:
-    """Hash of (filename, size) pairs -> stable collection id."""
+_genai_configured = False
+
+def configure_genai() -> None:
+    """Configure google.generativeai on first use; importing it costs ~0.7 s."""
+    global _genai_configured
+    if _genai_configured:
+        return
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY", "").strip())
+    _genai_configured = True
+
+def collection_id_from_blobs(blobs: list[tuple[str, str]]) -> str:
+    """Hash of (filename, content digest) pairs -> stable collection id.
+
+    Different files that share a name and size get different ids, so uploads
+    never overwrite another collection's manifest.
+    """
     h = hashlib.sha256()
-    for name, size in sorted(file_infos):
-        h.update(name.encode("utf-8"))
-        h.update(str(size).encode("utf-8"))
+    for name, digest in sorted(blobs):
+        h.update(f"{name}\0{digest}\n".encode("utf-8"))
     return h.hexdigest()[:16]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+import re, zlib
+import numpy as np
+from .config import DEDUP_THRESHOLD, DEDUP_SHINGLE_WORDS, DEDUP_NUM_PERM, DEDUP_BANDS
+from .pdf_utils import Chunk
+
+_PRIME = (1 << 31) - 1  # keeps a * h + b below 2**63
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+@dataclass
+class DedupReport:
+    total: int
+    kept: int
+    removed: int
+    embedding_calls_saved: int
+
+def shingles(text: str, k: int = DEDUP_SHINGLE_WORDS) -> List[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= k:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.int64)
+        self.b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.int64)
+
+    def signature(self, text: str) -> np.ndarray:
+        sh = shingles(text)
+        if not sh:
+            return np.full(self.a.shape[0], _PRIME, dtype=np.int64)
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in set(sh)), dtype=np.int64)
+        return ((self.a * h[None, :] + self.b) % _PRIME).min(axis=1)
+
+def dedup_chunks(
+    chunks: List[Chunk],
+    threshold: float = DEDUP_THRESHOLD,
+    num_perm: int = DEDUP_NUM_PERM,
+    bands: int = DEDUP_BANDS,
+) -> Tuple[List[Chunk], DedupReport]:
+    """Collapse near-duplicate chunks into the first occurrence.
+
+    Candidates come from MinHash LSH banding and are confirmed by the estimated
+    Jaccard similarity and identical numbers, so e.g. a 2024 and a 2025 fee table
+    are both kept; each kept chunk records every (doc, page) it appears on.
+    """
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    kept: List[Chunk] = []
+    sigs: List[np.ndarray] = []
+    numbers: List[List[str]] = []
+    for c in chunks:
+        sig = hasher.signature(c.text)
+        nums = _NUMBER.findall(c.text)
+        keys = [(i, sig[i * rows:(i + 1) * rows].tobytes()) for i in range(bands)]
+        match = -1
+        for idx in sorted({j for key in keys for j in buckets.get(key, ())}):
+            if numbers[idx] == nums and float(np.mean(sigs[idx] == sig)) >= threshold:
+                match = idx
+                break
+        if match >= 0:
+            rep = kept[match]
+            if not rep.occurrences:
+                rep.occurrences = [(rep.doc, rep.page)]
+            if (c.doc, c.page) not in rep.occurrences:
+                rep.occurrences.append((c.doc, c.page))
+            continue
+        for key in keys:
+            buckets.setdefault(key, []).append(len(kept))
+        kept.append(c)
+        sigs.append(sig)
+        numbers.append(nums)
+    removed = len(chunks) - len(kept)
+    return kept, DedupReport(total=len(chunks), kept=len(kept), removed=removed, embedding_calls_saved=removed)
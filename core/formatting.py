@@ -1,92 +1,125 @@
 from __future__ import annotations
-from typing import List, Optional
+from typing import Dict, List, Optional
 import re
 
+# clean_markdown() in a single regex pass. The alternatives reproduce, in one scan,
+# the old chain: collapse [ \t]+, drop whitespace before .,;:, add a space after ,;:
+# (never before a "."), and collapse runs of dots. The leading lookahead lets the
+# engine skip ordinary characters without trying every alternative.
+_CLEAN = re.compile(
+    r"(?=[,;:.\s])(?:"
+    r"(?P<mark_dot>[,;:]\s*\.(?:\s*\.)*)"  # ",  .." -> ",."
+    r"|(?P<mark_mark>[,;:]\s*[,;:])"       # ",  ;"  -> ", ;"
+    r"|(?P<mark_char>[,;:][^\s])"          # ",x"    -> ", x"
+    r"|(?P<space_mark>\s+(?=[.,;:]))"      # " ,"    -> ","
+    r"|(?P<dots>\.(?:\s*\.)+)"             # ". ."   -> "."
+    r"|(?P<blanks>[ \t]{2,}|\t))"          # blanks  -> " "
+)
+_TERMINAL = (".", "!", "?", ")")
+_NUM_MARKER = re.compile(r"(?<!\S)(\d+[.)])\s+")
+_ITEM_HEAD = re.compile(r"(?:\*\*)?([^*:]+?)(?:\*\*)?\s*:\s*(.*)", flags=re.S)
+_STAR_SPLIT = re.compile(r"\s*\*\s+")
+_SPLIT_STOPS: Dict[str, "re.Pattern[str]"] = {}
+
+def _clean_sub(m: re.Match) -> str:
+    kind = m.lastgroup
+    if kind == "space_mark":
+        return ""
+    if kind == "blanks":
+        return " "
+    if kind == "dots":
+        return "."
+    s = m.group()
+    if kind == "mark_dot":
+        return s[0] + "."
+    return f"{s[0]} {s[-1]}"  # mark_mark / mark_char
+
 def clean_markdown(text: str) -> str:
-    s = text.replace("**", "").replace("__", "").strip()
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\s+([\.,;:])", r"\1", s)
-    s = re.sub(r"([,;:])([^\s])", r"\1 \2", s)
-    s = re.sub(r"\s+\.", ".", s)
-    s = re.sub(r"\.{2,}", ".", s)
-    return s.strip()
+    s = text.replace("**", "").replace("__", "")
+    return _CLEAN.sub(_clean_sub, s).strip()
 
 def ensure_period(s: str) -> str:
     s = s.strip()
     if not s:
         return s
-    return s if re.search(r"[.!?)]$", s) else s + "."
+    return s if s.endswith(_TERMINAL) else s + "."
 
 def split_outside_parens(text: str, sep: str) -> List[str]:
-    out, buf, depth = [], "", 0
-    for ch in text:
+    stops = _SPLIT_STOPS.get(sep)
+    if stops is None:
+        stops = _SPLIT_STOPS[sep] = re.compile("[()" + re.escape(sep) + "]")
+    out: List[str] = []
+    depth, start = 0, 0
+    for m in stops.finditer(text):  # only visit parens and separators
+        ch = m.group()
         if ch == "(":
             depth += 1
         elif ch == ")":
             depth = max(depth - 1, 0)
-        if ch == sep and depth == 0:
-            if buf.strip():
-                out.append(buf.strip())
-            buf = ""
-        else:
-            buf += ch
-    if buf.strip():
-        out.append(buf.strip())
+        elif depth == 0:
+            part = text[start:m.start()].strip()
+            if part:
+                out.append(part)
+            start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        out.append(tail)
     return out
 
+def _format_item(raw: str) -> str:
+    """One numbered item: optional "Head:" line plus its sub-points as bullets."""
+    head, rest = None, raw
+    mhead = _ITEM_HEAD.match(rest) if ":" in rest else None
+    if mhead:
+        head, rest = mhead.group(1).strip(), mhead.group(2).strip()
+
+    if "•" in rest:
+        subs = [p.strip(" •-") for p in rest.split("•") if p.strip(" •-")]
+    elif "*" in rest:
+        subs = [p.strip(" -*") for p in _STAR_SPLIT.split(rest) if p.strip(" -*")]
+    else:
+        subs = split_outside_parens(rest, ";") if ";" in rest else ([rest] if rest else [])
+        if len(subs) <= 1 and rest.count(",") >= 2 and len(rest) < 320:
+            subs = [p.strip() for p in rest.split(",") if p.strip()]
+
+    block_lines: List[str] = []
+    if head:
+        block_lines.append(ensure_period(head))
+    if subs:
+        if len(subs) == 1 and not head:
+            block_lines.append(ensure_period(subs[0]))
+        else:
+            for sp in subs:
+                block_lines.append(f"- {ensure_period(sp)}")
+    elif not head:
+        block_lines.append(ensure_period(raw))
+    return "\n".join(block_lines)
+
+def _intro_header(intro: str) -> str:
+    intro = intro.strip().rstrip(" :")
+    return intro + ":\n\n" if intro else ""
+
 def parse_numbered_markdown(s: str) -> Optional[str]:
-    pattern = re.compile(r"(?:(?<=\s)|^)(\d+[\.\)])\s+", flags=re.S)
-    matches = list(pattern.finditer(s))
+    matches = list(_NUM_MARKER.finditer(s))
     if not matches:
         return None
 
-    intro = s[:matches[0].start()].strip().rstrip(" :")
     items: List[str] = []
     for i, m in enumerate(matches):
-        start = m.end()
         end = matches[i + 1].start() if i + 1 < len(matches) else len(s)
-        raw = s[start:end].strip()
-        if not raw:
-            continue
-
-        head, rest = None, raw
-        mhead = re.match(r"(?:\*\*)?([^*:]+?)(?:\*\*)?\s*:\s*(.*)", rest, flags=re.S)
-        if mhead:
-            head, rest = mhead.group(1).strip(), mhead.group(2).strip()
-
-        if "•" in rest:
-            subs = [p.strip(" •-") for p in rest.split("•") if p.strip(" •-")]
-        elif "*" in rest:
-            subs = [p.strip(" -*") for p in re.split(r"\s*\*\s+", rest) if p.strip(" -*")]
-        else:
-            subs = split_outside_parens(rest, ";")
-            if len(subs) <= 1 and rest.count(",") >= 2 and len(rest) < 320:
-                subs = [p.strip() for p in rest.split(",") if p.strip()]
-
-        block_lines: List[str] = []
-        if head:
-            block_lines.append(ensure_period(head))
-        if subs:
-            if len(subs) == 1 and not head:
-                block_lines.append(ensure_period(subs[0]))
-            else:
-                for sp in subs:
-                    block_lines.append(f"- {ensure_period(sp)}")
-        elif not head:
-            block_lines.append(ensure_period(raw))
-
-        items.append("\n".join(block_lines))
+        raw = s[m.end():end].strip()
+        if raw:
+            items.append(_format_item(raw))
 
     numbered = "\n".join(f"{idx+1}. {it}" for idx, it in enumerate(items))
-    return (intro + ":\n\n" if intro else "") + numbered
+    return _intro_header(s[:matches[0].start()]) + numbered
 
-def prettify_answer(ans: str) -> str:
-    s = clean_markdown(ans)
+def _prettify_clean(s: str) -> str:
     numbered = parse_numbered_markdown(s)
     if numbered:
         return numbered
     if s.startswith("* ") or " * " in s:
-        parts = [p.strip(" -*") for p in re.split(r"\s*\*\s+", s) if p.strip(" -*")]
+        parts = [p.strip(" -*") for p in _STAR_SPLIT.split(s) if p.strip(" -*")]
         if len(parts) > 1:
             return "\n".join(f"- {ensure_period(p)}" for p in parts)
     if "•" in s and (s.count("•") >= 2 or "\n" not in s):
@@ -94,3 +127,86 @@ def prettify_answer(ans: str) -> str:
         if len(parts) > 1:
             return "\n".join(f"- {ensure_period(p)}" for p in parts)
     return ensure_period(s)
+
+def prettify_answer(ans: str) -> str:
+    return _prettify_clean(clean_markdown(ans))
+
+def _safe_cut(raw: str, start: int) -> int:
+    """Last i >= start with raw[i-1] and raw[i] both alphanumeric, else 0.
+
+    Nothing in clean_markdown() matches across such a boundary, so the text can be
+    cleaned in independent pieces split there.
+    """
+    for i in range(len(raw) - 1, max(start, 1) - 1, -1):
+        if raw[i].isalnum() and raw[i - 1].isalnum():
+            return i
+    return 0
+
+def _marker_tail(text: str) -> int:
+    """Start of the longest suffix that could still grow into a numbered marker."""
+    t = text.rstrip()
+    if t.endswith((".", ")")):
+        t = t[:-1]
+    i = len(t)
+    while i and t[i - 1].isdecimal():
+        i -= 1
+    return i
+
+class StreamingFormatter:
+    """prettify_answer() for text that arrives in chunks (e.g. a streamed LLM reply).
+
+    feed() returns the formatted output that can no longer change: it is always a
+    prefix of finish(), which equals prettify_answer() of all chunks. Numbered items
+    are emitted as soon as the next item's marker arrives; each chunk is cleaned once.
+    """
+
+    def __init__(self) -> None:
+        self._raw = ""                 # not yet cleaned (after the last safe cut)
+        self._cleaned: List[str] = []  # cleaned pieces, joined by finish()
+        self._seen: List[str] = []     # cleaned text of the open intro/item, before _win
+        self._win = ""                 # cleaned text still being searched for a marker
+        self._scan = 0                 # search position in _win
+        self._in_items = False
+        self._count = 0
+        self._stable = ""
+
+    def feed(self, chunk: str) -> str:
+        checked = len(self._raw)
+        self._raw += chunk
+        cut = _safe_cut(self._raw, checked)
+        if cut:
+            piece = clean_markdown(self._raw[:cut])
+            self._raw = self._raw[cut:]
+            self._cleaned.append(piece)
+            self._win += piece
+            self._advance()
+        return self._stable
+
+    def finish(self) -> str:
+        self._cleaned.append(clean_markdown(self._raw))
+        self._raw = ""
+        return _prettify_clean("".join(self._cleaned))
+
+    def _advance(self) -> None:
+        while True:
+            m = _NUM_MARKER.search(self._win, self._scan)
+            if m is None or m.end() >= len(self._win):
+                # Only a trailing run of digits/./)/blanks can still become (or extend) a
+                # marker. Keep it, plus one character for the lookbehind; set the rest aside.
+                tail = max(_marker_tail(self._win), self._scan)
+                keep = max(tail - 1, 0)
+                self._seen.append(self._win[:keep])
+                self._win, self._scan = self._win[keep:], tail - keep
+                return
+            segment = "".join(self._seen) + self._win[:m.start()]
+            if not self._in_items:
+                self._stable = _intro_header(segment)
+                self._in_items = True
+            else:
+                raw = segment.strip()
+                if raw:
+                    self._count += 1
+                    sep = "\n" if self._count > 1 else ""
+                    self._stable += f"{sep}{self._count}. {_format_item(raw)}"
+            self._seen = []
+            self._win, self._scan = self._win[m.end():], 0
@@ -1,7 +1,17 @@
 from __future__ import annotations
-from typing import List, Dict, Optional
-import json, os, time, uuid
-from .config import THREADS_PATH, MAX_SESSION_SUMMARY_TURNS
+from typing import Callable, List, Dict, Optional
+import json, os, threading, time, uuid
+from .config import (
+    THREADS_PATH, MAX_SESSION_SUMMARY_TURNS, SUMMARY_TOKEN_BUDGET,
+    SUMMARY_SNIPPET_CHARS, SUMMARY_EARLIER_CHARS, SUMMARY_COMPACT_TRIGGER, SUMMARY_COMPACT_TOKENS,
+)
+
+# Serializes read-modify-write cycles on threads.json (background compaction writes too).
+_LOCK = threading.RLock()
+# tid -> rolling summary; keeps prompt assembly independent of thread length.
+_SUMMARY_CACHE: Dict[str, Dict] = {}
+_compactor: Optional[Callable[[str], str]] = None
+_compacting: set[str] = set()
 
 def _read_threads() -> List[Dict]:
     if not os.path.exists(THREADS_PATH):
@@ -13,24 +23,53 @@ def _read_threads() -> List[Dict]:
         return []
 
 def _write_threads(data: List[Dict]) -> None:
+    # Write-then-rename so concurrent readers never see a partially written file.
     os.makedirs(os.path.dirname(THREADS_PATH), exist_ok=True)
-    with open(THREADS_PATH, "w", encoding="utf-8") as f:
+    tmp = f"{THREADS_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, THREADS_PATH)
+
+def read_threads_strict() -> List[Dict]:
+    """All threads, raising OSError/ValueError if threads.json cannot be read.
+
+    For callers that delete data based on what threads reference (storage GC):
+    an unreadable file must not look like "no threads".
+    """
+    with _LOCK:
+        if not os.path.exists(THREADS_PATH):
+            return []
+        with open(THREADS_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{THREADS_PATH}: expected a list of threads")
+    return data
 
 def create_thread(title: str, collection_id: Optional[str]) -> str:
-    threads = _read_threads()
-    tid = uuid.uuid4().hex[:12]
-    threads.append({"id": tid, "title": title, "collection_id": collection_id, "messages": [], "created": time.time()})
-    _write_threads(threads)
+    with _LOCK:
+        threads = _read_threads()
+        tid = uuid.uuid4().hex[:12]
+        threads.append({"id": tid, "title": title, "collection_id": collection_id, "messages": [],
+                        "summary": {"earlier": [], "recent": [], "compacted": 0}, "created": time.time()})
+        _write_threads(threads)
     return tid
 
 def append_message(tid: str, role: str, content: str) -> None:
-    threads = _read_threads()
-    for t in threads:
-        if t["id"] == tid:
-            t["messages"].append({"role": role, "content": content, "ts": time.time()})
-            break
-    _write_threads(threads)
+    needs_compaction = False
+    with _LOCK:
+        threads = _read_threads()
+        for t in threads:
+            if t["id"] == tid:
+                t["messages"].append({"role": role, "content": content, "ts": time.time()})
+                summary = t.get("summary") or _summary_from_messages(t["messages"][:-1])
+                _summary_add(summary, role, content)
+                t["summary"] = summary
+                _SUMMARY_CACHE[tid] = summary
+                needs_compaction = _approx_tokens(" ; ".join(_pending(summary))) > SUMMARY_COMPACT_TRIGGER
+                break
+        _write_threads(threads)
+    if needs_compaction:
+        _maybe_compact(tid)
 
 def get_thread(tid: str) -> Optional[Dict]:
     for t in _read_threads():
@@ -39,40 +78,126 @@ def get_thread(tid: str) -> Optional[Dict]:
     return None
 
 def set_thread_title(tid: str, new_title: str) -> None:
-    threads = _read_threads()
-    for t in threads:
-        if t["id"] == tid:
-            t["title"] = new_title
-            break
-    _write_threads(threads)
+    with _LOCK:
+        threads = _read_threads()
+        for t in threads:
+            if t["id"] == tid:
+                t["title"] = new_title
+                break
+        _write_threads(threads)
 
 def set_thread_collection(tid: str, collection_id: Optional[str]) -> None:
-    threads = _read_threads()
-    for t in threads:
-        if t["id"] == tid:
-            t["collection_id"] = collection_id
-            break
-    _write_threads(threads)
+    with _LOCK:
+        threads = _read_threads()
+        for t in threads:
+            if t["id"] == tid:
+                t["collection_id"] = collection_id
+                break
+        _write_threads(threads)
 
 def list_threads() -> List[Dict]:
     return sorted(_read_threads(), key=lambda x: x.get("created", 0), reverse=True)
 
 def update_thread_title_if_empty(tid: str, fallback_title: str) -> None:
-    threads = _read_threads()
-    for t in threads:
-        if t["id"] == tid and (not t["title"] or t["title"].strip().lower() == "new topic"):
-            t["title"] = fallback_title
-            break
-    _write_threads(threads)
+    with _LOCK:
+        threads = _read_threads()
+        for t in threads:
+            if t["id"] == tid and (not t["title"] or t["title"].strip().lower() == "new topic"):
+                t["title"] = fallback_title
+                break
+        _write_threads(threads)
+
+def set_summary_compactor(fn: Optional[Callable[[str], str]]) -> None:
+    """Register fn(text) -> shorter text used to compact folded turns; None disables it."""
+    global _compactor
+    _compactor = fn
+
+def _approx_tokens(text: str) -> int:
+    return len(text) // 3 + 1
+
+def _tokens_to_chars(tokens: int) -> int:
+    return tokens * 3  # inverse of _approx_tokens()
+
+def _pending(summary: Dict) -> List[str]:
+    """Folded turns not yet covered by a compaction (the first entry may be one)."""
+    return summary["earlier"][summary.get("compacted", 0):]
+
+def _snippet(content: str, limit: int) -> str:
+    return " ".join(content.split())[:limit]
+
+def _render_summary(summary: Dict) -> str:
+    parts: List[str] = []
+    if summary["earlier"]:
+        parts.append("Earlier: " + " ; ".join(summary["earlier"]))
+    parts.extend(summary["recent"])
+    return " ; ".join(parts)
+
+def _summary_add(summary: Dict, role: str, content: str) -> None:
+    if role not in ("user", "assistant"):
+        return
+    tag = "Q" if role == "user" else "A"
+    summary["recent"].append(f"{tag}: {_snippet(content, SUMMARY_SNIPPET_CHARS)}")
+    # Fold the oldest recent turns into "earlier" once over the turn or token budget.
+    while len(summary["recent"]) > 1 and (
+        len(summary["recent"]) > MAX_SESSION_SUMMARY_TURNS
+        or _approx_tokens(_render_summary(summary)) > SUMMARY_TOKEN_BUDGET
+    ):
+        summary["earlier"].append(summary["recent"].pop(0)[: SUMMARY_EARLIER_CHARS + 3])
+    # Still over budget (a single long recent turn): drop the oldest folded turns.
+    while summary["earlier"] and _approx_tokens(_render_summary(summary)) > SUMMARY_TOKEN_BUDGET:
+        summary["earlier"].pop(0)
+        summary["compacted"] = 0
+
+def _summary_from_messages(messages: List[Dict]) -> Dict:
+    summary: Dict = {"earlier": [], "recent": [], "compacted": 0}
+    for m in messages:
+        _summary_add(summary, m["role"], m["content"])
+    return summary
+
+def _maybe_compact(tid: str) -> None:
+    if _compactor is None or tid in _compacting:
+        return
+    _compacting.add(tid)
+    threading.Thread(target=_compact_thread_summary, args=(tid,), daemon=True).start()
+
+def _compact_thread_summary(tid: str) -> None:
+    try:
+        summary = _SUMMARY_CACHE.get(tid)
+        if summary is None or _compactor is None:
+            return
+        folded = list(summary["earlier"])
+        if _approx_tokens(" ; ".join(_pending(summary))) <= SUMMARY_COMPACT_TRIGGER:
+            return
+        try:
+            compact = _snippet(_compactor(" ; ".join(folded)), _tokens_to_chars(SUMMARY_COMPACT_TOKENS))
+        except Exception:
+            return
+        if not compact or compact.startswith("__LLM_ERROR__"):
+            return
+        with _LOCK:
+            threads = _read_threads()
+            for t in threads:
+                if t["id"] != tid:
+                    continue
+                current = t.get("summary") or _summary_from_messages(t["messages"])
+                # Turns may have been folded while the compactor ran; keep those.
+                if current["earlier"][: len(folded)] == folded:
+                    current["earlier"] = [compact] + current["earlier"][len(folded):]
+                    current["compacted"] = 1
+                    t["summary"] = current
+                    _SUMMARY_CACHE[tid] = current
+                    _write_threads(threads)
+                break
+    finally:
+        _compacting.discard(tid)
 
 def conversation_summary_for_prompt(tid: str) -> str:
-    t = get_thread(tid)
-    if not t:
-        return ""
-    msgs = [m for m in t["messages"] if m["role"] in ("user", "assistant")]
-    items: List[str] = []
-    for m in msgs[-MAX_SESSION_SUMMARY_TURNS:]:
-        role = "Q" if m["role"] == "user" else "A"
-        snippet = m["content"].replace("\n", " ")[:80]
-        items.append(f"{role}: {snippet}")
-    return " ; ".join(items)
+    summary = _SUMMARY_CACHE.get(tid)
+    if summary is None:
+        t = get_thread(tid)
+        if not t:
+            return ""
+        # Threads saved before rolling summaries existed are summarized once here.
+        summary = t.get("summary") or _summary_from_messages(t["messages"])
+        _SUMMARY_CACHE[tid] = summary
+    return _render_summary(summary)
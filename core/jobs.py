@@ -0,0 +1,174 @@
+from __future__ import annotations
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+import json, os, queue, shutil, threading, time
+import numpy as np
+from .config import VS_BASE, INGEST_BATCH_SIZE, INGEST_WORKERS, DEDUP_ENABLED
+from .dedup import dedup_chunks
+from .embeddings import GeminiEmbedder
+from .pdf_utils import Chunk, build_chunks
+from .scheduler import BULK, priority_class
+from .vector_store import VectorStore
+
+# Job states persisted in <VS_BASE>/<collection_id>/_job/job.json
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+def _job_dir(collection_id: str) -> str:
+    return os.path.join(VS_BASE, collection_id, "_job")
+
+def _index_exists(collection_id: str) -> bool:
+    folder = os.path.join(VS_BASE, collection_id)
+    return os.path.exists(os.path.join(folder, "index.faiss")) and os.path.exists(os.path.join(folder, "meta.json"))
+
+def _write_json(path: str, data) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+class IngestJobQueue:
+    """Builds collection indexes on background workers, checkpointing each embedded batch.
+
+    One job per collection id: resubmitting a queued/running collection returns the
+    existing job, and jobs interrupted by a restart resume from their last batch.
+    """
+
+    def __init__(self, embedder: GeminiEmbedder, workers: int = INGEST_WORKERS):
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True).start()
+
+    def submit(self, collection_id: str, files: List[Tuple[str, str]]) -> Dict:
+        """Queue indexing of files [(doc name, path on disk)] into collection_id."""
+        with self._lock:
+            job = self._jobs.get(collection_id) or self._load(collection_id)
+            if job and job["state"] in (QUEUED, RUNNING):
+                return dict(job)
+            if _index_exists(collection_id):
+                return {"collection_id": collection_id, "state": DONE}
+            os.makedirs(_job_dir(collection_id), exist_ok=True)
+            previous = job or {}
+            job = {
+                "collection_id": collection_id, "state": QUEUED, "files": [list(f) for f in files],
+                "batches_done": 0, "batches_total": 0, "error": None, "updated": time.time(),
+            }
+            if previous.get("dedup") and os.path.exists(os.path.join(_job_dir(collection_id), "chunks.json")):
+                job["dedup"] = previous["dedup"]  # a retry reuses the deduplicated chunks
+            self._save(job)
+            self._queue.put(collection_id)
+            return dict(job)
+
+    def status(self, collection_id: str) -> Optional[Dict]:
+        """Current job, a synthetic "done" job for an existing index, or None if there is neither."""
+        with self._lock:
+            job = self._jobs.get(collection_id) or self._load(collection_id)
+            if job and job["state"] == DONE and not _index_exists(collection_id):
+                del self._jobs[collection_id]  # index evicted since; it needs a new job
+                job = None
+            if job:
+                return dict(job)
+        return {"collection_id": collection_id, "state": DONE} if _index_exists(collection_id) else None
+
+    def resume_pending(self) -> List[str]:
+        """Re-queue jobs left queued/running by a previous process."""
+        resumed: List[str] = []
+        if not os.path.isdir(VS_BASE):
+            return resumed
+        with self._lock:
+            for cid in sorted(os.listdir(VS_BASE)):
+                job = self._jobs.get(cid) or self._load(cid)
+                if job and job["state"] in (QUEUED, RUNNING) and cid not in resumed:
+                    job["state"] = QUEUED
+                    self._save(job)
+                    self._queue.put(cid)
+                    resumed.append(cid)
+        return resumed
+
+    # ---------- internals ----------
+    def _load(self, collection_id: str) -> Optional[Dict]:
+        path = os.path.join(_job_dir(collection_id), "job.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except Exception:
+            return None
+        self._jobs[collection_id] = job
+        return job
+
+    def _save(self, job: Dict) -> None:
+        job["updated"] = time.time()
+        self._jobs[job["collection_id"]] = job
+        _write_json(os.path.join(_job_dir(job["collection_id"]), "job.json"), job)
+
+    def _update(self, job: Dict, **changes) -> None:
+        with self._lock:
+            job.update(changes)
+            self._save(job)
+
+    def _worker(self) -> None:
+        while True:
+            cid = self._queue.get()
+            try:
+                with self._lock:
+                    job = self._jobs.get(cid) or self._load(cid)
+                    if not job or job["state"] != QUEUED:
+                        continue
+                    job["state"] = RUNNING
+                    self._save(job)
+                try:
+                    with priority_class(BULK):
+                        self._run(job)
+                except Exception as e:
+                    self._update(job, state=FAILED, error=f"{type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: Dict) -> None:
+        cid = job["collection_id"]
+        jdir = _job_dir(cid)
+        chunks_path = os.path.join(jdir, "chunks.json")
+        if os.path.exists(chunks_path):
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                chunks = [Chunk(**c) for c in json.load(f)]
+        else:
+            files_bytes: List[Tuple[str, bytes]] = []
+            for name, path in job["files"]:
+                with open(path, "rb") as f:
+                    files_bytes.append((name, f.read()))
+            chunks = build_chunks(files_bytes)
+            if not chunks:
+                raise RuntimeError("No text extracted from PDFs.")
+            if DEDUP_ENABLED:
+                chunks, report = dedup_chunks(chunks)
+                self._update(job, dedup=asdict(report))
+            _write_json(chunks_path, [asdict(c) for c in chunks])
+
+        n_batches = (len(chunks) + INGEST_BATCH_SIZE - 1) // INGEST_BATCH_SIZE
+        batch_paths = [os.path.join(jdir, f"emb_{i:05d}.npy") for i in range(n_batches)]
+        done = sum(os.path.exists(p) for p in batch_paths)
+        self._update(job, batches_total=n_batches, batches_done=done)
+        for i, path in enumerate(batch_paths):
+            if os.path.exists(path):
+                continue
+            batch = chunks[i * INGEST_BATCH_SIZE:(i + 1) * INGEST_BATCH_SIZE]
+            # strict: an API failure fails the job instead of checkpointing zero vectors;
+            # resubmitting resumes from this batch.
+            embs = self.embedder.encode([c.text for c in batch], strict=True)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, embs)
+            os.replace(path + ".tmp", path)
+            done += 1
+            self._update(job, batches_done=done)
+
+        vs = VectorStore(self.embedder)
+        vs.build(chunks, embs=np.vstack([np.load(p) for p in batch_paths]))
+        vs.save(os.path.join(VS_BASE, cid))
+        if job.get("dedup"):
+            _write_json(os.path.join(VS_BASE, cid, "ingest_report.json"), {"dedup": job["dedup"]})
+        self._update(job, state=DONE)
+        shutil.rmtree(jdir, ignore_errors=True)
@@ -1,13 +1,17 @@
 from __future__ import annotations
 import google.generativeai as genai
+from .config import configure_genai
+from .scheduler import get_scheduler
 
 class GeminiLLM:
     def __init__(self, model_name: str):
+        configure_genai()
+        self.model_name = model_name
         self.model = genai.GenerativeModel(model_name)
 
     def generate(self, prompt: str) -> str:
         try:
-            out = self.model.generate_content([prompt])
+            out = get_scheduler().run(self.model_name, lambda: self.model.generate_content([prompt]))
             return (out.text or "").strip()
         except Exception as e:
             return f"__LLM_ERROR__ {type(e).__name__}: {e}"
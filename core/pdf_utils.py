@@ -1,9 +1,20 @@
 from __future__ import annotations
-import hashlib
-from dataclasses import dataclass
-from typing import List, Tuple, Optional
+import hashlib, os, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional
 import fitz  # PyMuPDF
-from .config import UPLOAD_DIR
+from .config import PAGE_CACHE_DIR, PDF_HANDLE_POOL_SIZE, PAGE_CACHE_MEM_ITEMS
+from .storage import resolve_doc_path
+
+# MuPDF documents are not thread-safe; every pool/render operation holds this lock.
+_RENDER_LOCK = threading.Lock()
+_CACHE_LOCK = threading.Lock()
+_HANDLES: "OrderedDict[str, Tuple[Tuple[float, int], fitz.Document]]" = OrderedDict()
+_DIGESTS: Dict[Tuple[str, float, int], str] = {}
+_PAGE_CACHE: "OrderedDict[Tuple[str, int, float], bytes]" = OrderedDict()
+_prefetcher: Optional[ThreadPoolExecutor] = None
 
 @dataclass
 class Chunk:
@@ -11,6 +22,8 @@ class Chunk:
     text: str
     page: int
     doc: str
+    # Every (doc, page) a near-duplicate of this chunk was found on; set by dedup_chunks.
+    occurrences: List[Tuple[str, int]] = field(default_factory=list)
 
 def extract_pdf_text(file_bytes: bytes) -> List[Tuple[int, str]]:
     pages: List[Tuple[int, str]] = []
@@ -47,12 +60,82 @@ def build_chunks(files: List[Tuple[str, bytes]]) -> List[Chunk]:
                 all_chunks.append(Chunk(id=cid, text=piece, page=page_no, doc=fname))
     return all_chunks
 
-def render_pdf_page_image(doc_name: str, page_no: int, zoom: float = 1.5) -> Optional[bytes]:
-    path = f"{UPLOAD_DIR}/{doc_name}"
+def _file_digest(path: str, stamp: Tuple[float, int]) -> str:
+    key = (path, *stamp)
+    digest = _DIGESTS.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = _DIGESTS[key] = h.hexdigest()[:16]
+    return digest
+
+def _pooled_document(path: str, stamp: Tuple[float, int]) -> fitz.Document:
+    """Open (or reuse) a document handle; caller holds _RENDER_LOCK."""
+    cached = _HANDLES.get(path)
+    if cached is not None and cached[0] == stamp:
+        _HANDLES.move_to_end(path)
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+    doc = fitz.open(path)
+    _HANDLES[path] = (stamp, doc)
+    while len(_HANDLES) > PDF_HANDLE_POOL_SIZE:
+        _, (_, old) = _HANDLES.popitem(last=False)
+        old.close()
+    return doc
+
+def _cached_page(key: Tuple[str, int, float]) -> Optional[bytes]:
+    with _CACHE_LOCK:
+        png = _PAGE_CACHE.get(key)
+        if png is not None:
+            _PAGE_CACHE.move_to_end(key)
+        return png
+
+def _remember_page(key: Tuple[str, int, float], png: bytes) -> None:
+    with _CACHE_LOCK:
+        _PAGE_CACHE[key] = png
+        _PAGE_CACHE.move_to_end(key)
+        while len(_PAGE_CACHE) > PAGE_CACHE_MEM_ITEMS:
+            _PAGE_CACHE.popitem(last=False)
+
+def render_pdf_page_image(
+    doc_name: str, page_no: int, zoom: float = 1.5, collection_id: Optional[str] = None
+) -> Optional[bytes]:
+    """PNG of one page, served from memory, then disk, then a pooled render."""
+    path = resolve_doc_path(doc_name, collection_id)
     try:
-        with fitz.open(path) as d:
-            idx = max(0, min(page_no - 1, d.page_count - 1))
-            pix = d.load_page(idx).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
-            return pix.tobytes("png")
+        st = os.stat(path)
+        stamp = (st.st_mtime, st.st_size)
+        key = (_file_digest(path, stamp), int(page_no), float(zoom))
+        png = _cached_page(key)
+        if png is not None:
+            return png
+        disk_path = os.path.join(PAGE_CACHE_DIR, f"{key[0]}_{key[1]}_{key[2]:g}.png")
+        if os.path.exists(disk_path):
+            with open(disk_path, "rb") as f:
+                png = f.read()
+        else:
+            with _RENDER_LOCK:
+                d = _pooled_document(path, stamp)
+                idx = max(0, min(page_no - 1, d.page_count - 1))
+                pix = d.load_page(idx).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                png = pix.tobytes("png")
+            os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+            tmp = f"{disk_path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, disk_path)
+        _remember_page(key, png)
+        return png
     except Exception:
         return None
+
+def prefetch_pages(sources: List[Dict], zoom: float = 1.5, collection_id: Optional[str] = None) -> None:
+    """Render the pages cited by make_context() in the background."""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch")
+    for doc, page in dict.fromkeys((m["doc"], int(m["page"])) for m in sources):
+        _prefetcher.submit(render_pdf_page_image, doc, page, zoom, collection_id)
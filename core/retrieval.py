@@ -17,11 +17,25 @@ GENERAL_PROMPT_PREFIX = (
     "provide a concise, high-quality general answer. Use clean Markdown with multi-line lists when applicable."
 )
 
+SUMMARY_COMPACTION_PROMPT = (
+    "Condense these earlier conversation turns (Q = user, A = assistant) into one short paragraph "
+    "that keeps names, numbers and open questions. Plain text, no lists."
+)
+
 GENERIC_PATTERNS = re.compile(
     r"\b(what\s+is|who\s+is|define|definition\s+of|when\s+is|where\s+is|capital\s+of|pm\s+of|president\s+of|meaning\s+of)\b",
     re.IGNORECASE,
 )
 
+_NON_WORD = re.compile(r"\W+")
+
+def normalize_term(token: str) -> str:
+    """Whitespace-split token -> lowercase word without punctuation ("E-mail," -> "email").
+
+    Used for both the BM25 vocabulary and query terms so the two sides always match.
+    """
+    return _NON_WORD.sub("", token.lower())
+
 def is_generic_query(q: str) -> bool:
     if GENERIC_PATTERNS.search(q):
         if re.search(r"\b(according to|in the (document|report|pdf|paper|syllabus))\b", q, re.IGNORECASE):
@@ -44,7 +58,10 @@ def make_context(ranked: List[Tuple[str, float]], meta: Dict[str, Dict], token_c
         used += len(block)
         ctx_parts.append(block)
         pages.append(int(m["page"]))
-        metas.append({"page": m["page"], "doc": m["doc"], "score": round(float(score), 4)})
+        src = {"page": m["page"], "doc": m["doc"], "score": round(float(score), 4)}
+        if m.get("occurrences"):
+            src["occurrences"] = m["occurrences"]
+        metas.append(src)
     return "\n\n".join(ctx_parts), pages, metas
 
 def build_prompt(user_q: str, conversation_summary: str, context_block: str, general: bool = False) -> str:
@@ -62,6 +79,9 @@ def build_prompt(user_q: str, conversation_summary: str, context_block: str, gen
         f"Answer:"
     )
 
+def build_summary_prompt(folded_turns: str) -> str:
+    return f"{SUMMARY_COMPACTION_PROMPT}\n\nTurns: {folded_turns}\n\nSummary:"
+
 def add_inline_citations(answer: str, pages: List[int]) -> str:
     pages = sorted(set(int(p) for p in pages))
     if not pages or "(page" in answer:
@@ -70,6 +90,11 @@ def add_inline_citations(answer: str, pages: List[int]) -> str:
         return f"{answer} (page {pages[0]})"
     return f"{answer} (pages {', '.join(map(str, pages))})"
 
+def extractive_answer(ranked: List[Tuple[str, float]], meta: Dict[str, Dict]) -> str:
+    """Best-matching excerpt as the answer, for queries the router sends past the LLM."""
+    m = meta[ranked[0][0]]
+    return f"{m['text'].strip()}\n\n(page {m['page']})"
+
 def minimal_extractive_fallback(ranked: List[Tuple[str, float]], meta: Dict[str, Dict]) -> str:
     if not ranked:
         return "Sorry, I couldn't generate an answer right now. Please try again."
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
+import hashlib, json, os, threading, time, uuid
+from .config import (
+    LOW_CONFIDENCE_THRESH, ROUTER_MIN_COVERAGE, ROUTER_GENERIC_COVERAGE,
+    ROUTER_EXTRACTIVE_SCORE, ROUTER_EXTRACTIVE_ENABLED, ROUTER_LOG_PATH,
+)
+from .retrieval import is_generic_query, normalize_term
+
+if TYPE_CHECKING:
+    from .vector_store import VectorStore
+
+# Routes: answer from the documents with the LLM, answer generally (no retrieval),
+# or return the best-matching excerpt without any LLM call.
+GROUNDED, GENERAL, EXTRACTIVE = "grounded", "general", "extractive"
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or the this to "
+    "was what when where which who why will with you your about tell explain give list".split()
+)
+_log_lock = threading.Lock()
+
+@dataclass
+class RouteDecision:
+    route: str
+    reason: str
+    features: Dict[str, Optional[float]] = field(default_factory=dict)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+
+def query_terms(q: str) -> List[str]:
+    """Content terms of q, normalized like the collection vocabulary (VectorStore.term_stats)."""
+    terms = (normalize_term(w) for w in q.split())
+    return [t for t in terms if len(t) > 1 and t not in _STOPWORDS]
+
+def route_query(q: str, vs: Optional["VectorStore"]) -> RouteDecision:
+    """Pick grounded / general / extractive from local statistics only (no remote calls)."""
+    decision = _decide(q, vs)
+    _append_log({"type": "decision", "ts": time.time(), "query": query_fingerprint(q), **asdict(decision)})
+    return decision
+
+def _decide(q: str, vs: Optional["VectorStore"]) -> RouteDecision:
+    generic = is_generic_query(q)
+    if vs is None:
+        return RouteDecision(GENERAL, "no_collection", {"generic": float(generic)})
+    terms = query_terms(q)
+    coverage, mean_idf = vs.term_stats(terms)
+    cached_score = vs.cached_top_dense_score(q)
+    features = {
+        "generic": float(generic), "n_terms": float(len(terms)), "idf_coverage": round(coverage, 4),
+        "mean_idf": round(mean_idf, 4), "cached_score": None if cached_score is None else round(cached_score, 4),
+    }
+    if cached_score is not None:
+        # Logged either way so the threshold can be tuned before the route is enabled.
+        features["extractive_candidate"] = float(cached_score >= ROUTER_EXTRACTIVE_SCORE)
+        if ROUTER_EXTRACTIVE_ENABLED and cached_score >= ROUTER_EXTRACTIVE_SCORE:
+            return RouteDecision(EXTRACTIVE, "cached_score_high", features)
+        if cached_score < LOW_CONFIDENCE_THRESH:
+            return RouteDecision(GENERAL, "cached_score_low", features)
+    if terms and coverage < ROUTER_MIN_COVERAGE:
+        return RouteDecision(GENERAL, "low_idf_coverage", features)
+    if generic and coverage < ROUTER_GENERIC_COVERAGE:
+        return RouteDecision(GENERAL, "generic_query", features)
+    return RouteDecision(GROUNDED, "default", features)
+
+def _append_log(record: Dict) -> None:
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(ROUTER_LOG_PATH), exist_ok=True)
+            with open(ROUTER_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError:
+        pass  # the log is for offline tuning only
+
+def record_outcome(decision: RouteDecision, outcome: str, **details) -> None:
+    """Log what actually happened for a decision, e.g. grounded_not_found or general."""
+    _append_log({"type": "outcome", "ts": time.time(), "id": decision.id, "route": decision.route,
+                 "outcome": outcome, **details})
+
+def query_fingerprint(q: str) -> str:
+    return hashlib.sha256(q.strip().lower().encode("utf-8")).hexdigest()[:12]
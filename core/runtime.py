@@ -0,0 +1,89 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional
+import os, threading
+from .config import VS_BASE, VS_CACHE_SIZE, WARMUP_COLLECTIONS
+from .storage import gc_orphans, enforce_quota, last_used, touch_collection
+
+# Process-wide resources shared by all Streamlit sessions. Heavy modules (faiss,
+# numpy, google.generativeai, rank_bm25, fitz) are imported on first use only.
+if TYPE_CHECKING:
+    from .embeddings import GeminiEmbedder
+    from .jobs import IngestJobQueue
+    from .vector_store import VectorStore
+
+_lock = threading.RLock()
+_embedder: Optional["GeminiEmbedder"] = None
+_job_queue: Optional["IngestJobQueue"] = None
+_stores: "OrderedDict[str, VectorStore]" = OrderedDict()
+_warmup_started = False
+
+def get_embedder() -> "GeminiEmbedder":
+    global _embedder
+    with _lock:
+        if _embedder is None:
+            from .embeddings import GeminiEmbedder
+            _embedder = GeminiEmbedder()
+        return _embedder
+
+def get_job_queue() -> "IngestJobQueue":
+    """Ingestion queue; jobs interrupted by a previous process are resumed on creation."""
+    global _job_queue
+    with _lock:
+        if _job_queue is None:
+            from .jobs import IngestJobQueue
+            _job_queue = IngestJobQueue(get_embedder())
+            _job_queue.resume_pending()
+        return _job_queue
+
+def collection_ready(collection_id: str) -> bool:
+    return os.path.exists(os.path.join(VS_BASE, collection_id, "meta.json"))
+
+def load_collection(collection_id: str) -> Optional["VectorStore"]:
+    """Loaded VectorStore for a collection (LRU of VS_CACHE_SIZE), or None if not indexed."""
+    touch_collection(collection_id)
+    ready = collection_ready(collection_id)
+    with _lock:
+        vs = _stores.get(collection_id)
+        if vs is not None and ready:
+            _stores.move_to_end(collection_id)
+            return vs
+        _stores.pop(collection_id, None)  # index evicted to stay under the disk quota
+    if not ready:
+        return None
+    from .vector_store import VectorStore
+    vs = VectorStore(get_embedder())
+    vs.load(os.path.join(VS_BASE, collection_id))
+    with _lock:
+        _stores[collection_id] = vs
+        _stores.move_to_end(collection_id)
+        while len(_stores) > VS_CACHE_SIZE:
+            _stores.popitem(last=False)
+    return vs
+
+def recent_collections(limit: int = WARMUP_COLLECTIONS) -> List[str]:
+    """Indexed collections, most recently used first."""
+    if not os.path.isdir(VS_BASE):
+        return []
+    found = [(last_used(cid), cid) for cid in os.listdir(VS_BASE) if collection_ready(cid)]
+    return [cid for _, cid in sorted(found, reverse=True)[:limit]]
+
+def _warm_up(limit: int) -> None:
+    try:
+        gc_orphans()
+        enforce_quota()
+        get_job_queue()
+        for cid in recent_collections(limit):
+            load_collection(cid)
+        from . import pdf_utils  # noqa: F401  (fitz, for page previews)
+    except Exception:
+        pass  # warm-up is best effort; the request path loads on demand
+
+def start_warmup(limit: int = WARMUP_COLLECTIONS) -> None:
+    """Import heavy modules and preload recent collections on a background thread, once."""
+    global _warmup_started
+    with _lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=_warm_up, args=(limit,), name="warmup", daemon=True).start()
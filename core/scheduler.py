@@ -0,0 +1,179 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import heapq, itertools, threading, time
+from .config import (
+    SCHED_RPM, SCHED_DEFAULT_RPM, SCHED_MAX_CONCURRENCY, SCHED_MAX_RETRIES, SCHED_BACKOFF_S,
+)
+
+T = TypeVar("T")
+
+# Priority classes: lower runs first within a model's queue.
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+_priority: ContextVar[int] = ContextVar("gemini_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority_class(priority: int) -> Iterator[None]:
+    """Run API calls made inside the block (e.g. ingestion) with the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    # google.api_core errors and urllib's HTTPError both expose the HTTP status as .code
+    code = getattr(exc, "code", None)
+    return code if isinstance(code, int) else None
+
+def _is_retryable(exc: BaseException) -> bool:
+    code = _status_code(exc)
+    return code is not None and (code == 429 or 500 <= code < 600)
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take a token and return 0.0, or return the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+class _Lane:
+    """Per-model queue, rate limit and adaptive concurrency limit."""
+
+    def __init__(self, rpm: float, max_concurrency: int):
+        self.bucket = TokenBucket(rpm / 60.0, max(1.0, rpm / 60.0))
+        self.waiting: List[Tuple[int, int]] = []
+        self.inflight = 0
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.requests = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def on_success(self) -> None:
+        self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+
+    def on_throttle(self) -> None:
+        self.throttled += 1
+        self.limit = max(1.0, self.limit / 2.0)
+
+class GeminiScheduler:
+    def __init__(
+        self,
+        rpm: Optional[Dict[str, float]] = None,
+        default_rpm: float = SCHED_DEFAULT_RPM,
+        max_concurrency: int = SCHED_MAX_CONCURRENCY,
+        max_retries: int = SCHED_MAX_RETRIES,
+        backoff_s: float = SCHED_BACKOFF_S,
+    ):
+        self.rpm = dict(SCHED_RPM if rpm is None else rpm)
+        self.default_rpm = default_rpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self._cond = threading.Condition()
+        self._lanes: Dict[str, _Lane] = {}
+        self._seq = itertools.count()
+
+    def _lane(self, model: str) -> _Lane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _Lane(self.rpm.get(model, self.default_rpm), self.max_concurrency)
+        return lane
+
+    def _acquire(self, lane: _Lane, priority: int) -> None:
+        ticket = (priority, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(lane.waiting, ticket)
+            while True:
+                if lane.waiting[0] == ticket and lane.inflight < int(lane.limit):
+                    delay = lane.bucket.reserve()
+                    if delay <= 0.0:
+                        break
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+            heapq.heappop(lane.waiting)
+            lane.inflight += 1
+            waited = time.monotonic() - start
+            lane.requests += 1
+            lane.wait_total += waited
+            lane.wait_max = max(lane.wait_max, waited)
+            self._cond.notify_all()
+
+    def _release(self, lane: _Lane, ok: bool, throttled: bool) -> None:
+        with self._cond:
+            lane.inflight -= 1
+            if throttled:
+                lane.on_throttle()
+            elif ok:
+                lane.on_success()
+            self._cond.notify_all()
+
+    def run(self, model: str, fn: Callable[[], T], priority: Optional[int] = None) -> T:
+        """Call fn() once the model's rate and concurrency limits allow; retry on 429/5xx."""
+        priority = _priority.get() if priority is None else priority
+        with self._cond:
+            lane = self._lane(model)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(lane, priority)
+            ok = throttled = False
+            try:
+                result = fn()
+                ok = True
+                return result
+            except Exception as e:
+                throttled = _is_retryable(e)
+                if not throttled or attempt == self.max_retries:
+                    raise
+            finally:
+                self._release(lane, ok, throttled)
+            time.sleep(self.backoff_s * (2 ** attempt))
+        raise RuntimeError("unreachable")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Queue depth per priority class, wait times and current limits, per model."""
+        with self._cond:
+            out: Dict[str, Dict] = {}
+            for model, lane in self._lanes.items():
+                depth = {name: 0 for name in PRIORITY_NAMES.values()}
+                for prio, _ in lane.waiting:
+                    name = PRIORITY_NAMES.get(prio, str(prio))
+                    depth[name] = depth.get(name, 0) + 1
+                out[model] = {
+                    "queue_depth": depth,
+                    "inflight": lane.inflight,
+                    "concurrency_limit": int(lane.limit),
+                    "requests": lane.requests,
+                    "throttled": lane.throttled,
+                    "wait_avg_s": round(lane.wait_total / lane.requests, 4) if lane.requests else 0.0,
+                    "wait_max_s": round(lane.wait_max, 4),
+                }
+            return out
+
+_scheduler: Optional[GeminiScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> GeminiScheduler:
+    """Process-wide scheduler shared by every Streamlit session."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GeminiScheduler()
+        return _scheduler
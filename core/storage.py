@@ -0,0 +1,219 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import hashlib, json, os, shutil, time
+from .config import VS_BASE, UPLOAD_DIR, BLOB_DIR, PAGE_CACHE_DIR, STORAGE_QUOTA_MB, STORAGE_GRACE_S
+from .history import read_threads_strict
+
+# Uploads are stored once per content hash in BLOB_DIR; each collection folder in
+# VS_BASE keeps a files.json manifest of (doc name, content hash) so indexes can be
+# rebuilt after eviction, and a .last_used marker for LRU eviction.
+INDEX_FILES = ("index.faiss", "meta.json")
+
+def _collection_dir(collection_id: str) -> str:
+    return os.path.join(VS_BASE, collection_id)
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, f"{digest}.pdf")
+
+def _tree_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def store_upload(name: str, data: bytes) -> Tuple[str, str]:
+    """Store upload bytes by content hash; identical files are kept once. Returns (digest, path)."""
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    path = _blob_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    else:
+        os.utime(path)  # fresh blobs are protected from GC for STORAGE_GRACE_S
+    return digest, path
+
+def write_manifest(collection_id: str, files: List[Tuple[str, str]]) -> None:
+    """Record which blobs [(doc name, digest)] make up a collection."""
+    folder = _collection_dir(collection_id)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "files.json"), "w", encoding="utf-8") as f:
+        json.dump({"files": [list(x) for x in files]}, f, ensure_ascii=False)
+    touch_collection(collection_id)
+
+def read_manifest(collection_id: str) -> List[Tuple[str, str]]:
+    path = os.path.join(_collection_dir(collection_id), "files.json")
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [(name, digest) for name, digest in json.load(f)["files"]]
+    except Exception:
+        return []
+
+def manifest_files(collection_id: str) -> List[Tuple[str, str]]:
+    """[(doc name, blob path)] for a collection, ready for IngestJobQueue.submit()."""
+    return [(name, _blob_path(digest)) for name, digest in read_manifest(collection_id)]
+
+def resolve_doc_path(doc_name: str, collection_id: Optional[str] = None) -> str:
+    if collection_id:
+        for name, digest in read_manifest(collection_id):
+            if name == doc_name:
+                return _blob_path(digest)
+    return os.path.join(UPLOAD_DIR, doc_name)  # uploads saved before content addressing
+
+def touch_collection(collection_id: str) -> None:
+    marker = os.path.join(_collection_dir(collection_id), ".last_used")
+    try:
+        with open(marker, "a", encoding="utf-8"):
+            pass
+        os.utime(marker)
+    except OSError:
+        pass
+
+def last_used(collection_id: str) -> float:
+    folder = _collection_dir(collection_id)
+    for name in (".last_used", "meta.json", "files.json"):
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            return os.path.getmtime(path)
+    return os.path.getmtime(folder) if os.path.exists(folder) else 0.0
+
+def collection_refcounts() -> Dict[str, int]:
+    """Number of threads referencing each collection id.
+
+    Raises OSError/ValueError if threads.json is unreadable; GC and eviction abort then.
+    """
+    refs: Dict[str, int] = {}
+    for t in read_threads_strict():
+        cid = t.get("collection_id")
+        if cid:
+            refs[cid] = refs.get(cid, 0) + 1
+    return refs
+
+def _collections() -> List[str]:
+    if not os.path.isdir(VS_BASE):
+        return []
+    return sorted(d for d in os.listdir(VS_BASE) if os.path.isdir(_collection_dir(d)))
+
+def disk_usage() -> List[Dict]:
+    """Per-collection report: index bytes, bytes of blobs it references, refs, last use."""
+    try:
+        refs = collection_refcounts()
+    except (OSError, ValueError):
+        refs = {}  # report only; nothing is deleted from it
+    out: List[Dict] = []
+    for cid in _collections():
+        blobs = {d for _, d in read_manifest(cid)}
+        out.append({
+            "collection_id": cid,
+            "index_bytes": _tree_size(_collection_dir(cid)),
+            "blob_bytes": sum(_tree_size(_blob_path(d)) for d in blobs if os.path.exists(_blob_path(d))),
+            "refs": refs.get(cid, 0),
+            "indexed": all(os.path.exists(os.path.join(_collection_dir(cid), f)) for f in INDEX_FILES),
+            "last_used": last_used(cid),
+        })
+    return sorted(out, key=lambda r: r["index_bytes"] + r["blob_bytes"], reverse=True)
+
+def total_usage() -> int:
+    return sum(_tree_size(p) for p in (VS_BASE, BLOB_DIR, PAGE_CACHE_DIR) if os.path.exists(p))
+
+def _busy(collection_id: str) -> bool:
+    """True while an ingestion job is queued or running; failed jobs leave _job/ behind."""
+    path = os.path.join(_collection_dir(collection_id), "_job", "job.json")
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("state") in ("queued", "running")
+    except (OSError, ValueError):
+        return True  # unreadable: assume a job is using it
+
+def gc_orphans(grace_s: float = STORAGE_GRACE_S) -> Dict[str, int]:
+    """Delete collections no thread references, then blobs no collection references."""
+    now = time.time()
+    try:
+        refs = collection_refcounts()
+    except (OSError, ValueError):
+        return {"collections": 0, "blobs": 0}  # cannot tell what is referenced
+    removed_collections = removed_blobs = 0
+    for cid in _collections():
+        if refs.get(cid) or _busy(cid) or now - last_used(cid) < grace_s:
+            continue
+        shutil.rmtree(_collection_dir(cid), ignore_errors=True)
+        removed_collections += 1
+    live = {d for cid in _collections() for _, d in read_manifest(cid)}
+    if os.path.isdir(BLOB_DIR):
+        for name in os.listdir(BLOB_DIR):
+            path = os.path.join(BLOB_DIR, name)
+            if name[:-4] in live or now - os.path.getmtime(path) < grace_s:
+                continue
+            os.remove(path)
+            removed_blobs += 1
+    return {"collections": removed_collections, "blobs": removed_blobs}
+
+def enforce_quota(quota_bytes: int = STORAGE_QUOTA_MB * 1024 * 1024, grace_s: float = STORAGE_GRACE_S) -> List[str]:
+    """Evict until under quota: rendered page cache first, then least recently used collections.
+
+    Unreferenced collections are deleted; referenced ones only lose their index files
+    and are rebuilt from their manifest the next time the topic is opened.
+    """
+    usage = total_usage()
+    if usage <= quota_bytes:
+        return []
+    evicted: List[str] = []
+    if os.path.isdir(PAGE_CACHE_DIR):
+        pngs = []
+        for name in os.listdir(PAGE_CACHE_DIR):
+            if name.endswith(".tmp"):  # being written by the prefetcher
+                continue
+            path = os.path.join(PAGE_CACHE_DIR, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            pngs.append((info.st_mtime, info.st_size, path))
+        for _, size, path in sorted(pngs):
+            if usage <= quota_bytes:
+                return evicted
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            usage -= size
+    now = time.time()
+    try:
+        refs = collection_refcounts()
+    except (OSError, ValueError):
+        return evicted  # cannot tell what is referenced; only the page cache was trimmed
+    cold = [
+        c for c in _collections()
+        if not _busy(c) and now - last_used(c) >= grace_s
+        and not (refs.get(c) and not read_manifest(c))  # referenced but not rebuildable
+    ]
+    cold.sort(key=lambda c: (refs.get(c, 0) > 0, last_used(c)))
+    for cid in cold:
+        if usage <= quota_bytes:
+            break
+        folder = _collection_dir(cid)
+        if refs.get(cid):
+            for name in INDEX_FILES:
+                path = os.path.join(folder, name)
+                if os.path.exists(path):
+                    usage -= _tree_size(path)
+                    os.remove(path)
+        else:
+            usage -= _tree_size(folder)
+            shutil.rmtree(folder, ignore_errors=True)
+        evicted.append(cid)
+    if evicted:
+        gc_orphans(grace_s)
+    return evicted
@@ -1,10 +1,12 @@
 from __future__ import annotations
+from collections import OrderedDict
 from typing import Tuple, List, Dict
-import os, json, numpy as np, faiss
+import os, json, threading, numpy as np, faiss
 from rank_bm25 import BM25Okapi
 from .embeddings import GeminiEmbedder
 from .pdf_utils import Chunk
-from .config import DENSE_WEIGHT, BM25_WEIGHT
+from .config import DENSE_WEIGHT, BM25_WEIGHT, QUERY_CACHE_SIZE
+from .retrieval import normalize_term
 
 class VectorStore:
     def __init__(self, embedder: GeminiEmbedder):
@@ -14,16 +16,25 @@ class VectorStore:
         self.meta: Dict[str, Dict] = {}
         self._bm25: BM25Okapi | None = None
         self._bm25_tokens: list[list[str]] = []
+        self._vocab_idf: Dict[str, float] | None = None
+        # Query embeddings; stores are shared by all sessions (core.runtime), hence the lock.
+        self._qcache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._qlock = threading.Lock()
 
-    def build(self, chunks: List[Chunk]) -> None:
-        texts = [c.text for c in chunks]
-        embs = self.embedder.encode(texts)
+    def build(self, chunks: List[Chunk], embs: np.ndarray | None = None) -> None:
+        """Index chunks; pass precomputed (normalized) embeddings to skip encoding."""
+        if embs is None:
+            embs = self.embedder.encode([c.text for c in chunks])
         self.index = faiss.IndexFlatIP(embs.shape[1])
         self.index.add(embs)
         self.ids = [c.id for c in chunks]
         self.meta = {c.id: {"text": c.text, "page": c.page, "doc": c.doc} for c in chunks}
+        for c in chunks:
+            if c.occurrences:
+                self.meta[c.id]["occurrences"] = [list(o) for o in c.occurrences]
         self._bm25_tokens = [m["text"].lower().split() for m in self.meta.values()]
         self._bm25 = BM25Okapi(self._bm25_tokens)
+        self._vocab_idf = None
 
     def save(self, folder: str) -> None:
         os.makedirs(folder, exist_ok=True)
@@ -41,11 +52,34 @@ class VectorStore:
         self.meta = data["meta"]
         self._bm25_tokens = [m["text"].lower().split() for m in self.meta.values()]
         self._bm25 = BM25Okapi(self._bm25_tokens)
+        self._vocab_idf = None
+
+    def _cached_query_vec(self, q: str) -> np.ndarray | None:
+        with self._qlock:
+            vec = self._qcache.get(q)
+            if vec is not None:
+                self._qcache.move_to_end(q)
+            return vec
+
+    def _query_vec(self, q: str) -> np.ndarray:
+        vec = self._cached_query_vec(q)
+        if vec is not None:
+            return vec
+        vec = self.embedder.encode([q])  # remote call; not under the lock
+        if np.any(vec):  # a failed embedding call yields zeros; retry it next time
+            with self._qlock:
+                self._qcache[q] = vec
+                while len(self._qcache) > QUERY_CACHE_SIZE:
+                    self._qcache.popitem(last=False)
+        return vec
 
     def _dense(self, q: str, k: int) -> list[tuple[int, float]]:
         if self.index is None:
             return []
-        D, I = self.index.search(self.embedder.encode([q]), k)
+        return self._dense_vec(self._query_vec(q), k)
+
+    def _dense_vec(self, vec: np.ndarray, k: int) -> list[tuple[int, float]]:
+        D, I = self.index.search(vec, k)
         return list(zip(I[0].tolist(), [float(s) for s in D[0].tolist()]))
 
     def _bm25_search(self, q: str, k: int) -> list[tuple[int, float]]:
@@ -82,3 +116,25 @@ class VectorStore:
     def top_dense_score(self, q: str) -> float:
         hits = self._dense(q, 1)
         return hits[0][1] if hits else 0.0
+
+    def cached_top_dense_score(self, q: str) -> float | None:
+        """top_dense_score() only if q's embedding is already cached (no remote call)."""
+        vec = self._cached_query_vec(q)
+        if vec is None or self.index is None:
+            return None
+        hits = self._dense_vec(vec, 1)
+        return hits[0][1] if hits else 0.0
+
+    def term_stats(self, terms: List[str]) -> Tuple[float, float]:
+        """(fraction of terms in the BM25 vocabulary, mean IDF of the matched terms)."""
+        if self._bm25 is None or not terms:
+            return 0.0, 0.0
+        if self._vocab_idf is None:
+            vocab: Dict[str, float] = {}
+            for tok, idf in self._bm25.idf.items():
+                key = normalize_term(tok)
+                if key:
+                    vocab[key] = max(vocab.get(key, idf), idf)
+            self._vocab_idf = vocab
+        idfs = [self._vocab_idf[t] for t in terms if t in self._vocab_idf]
+        return len(idfs) / len(terms), (sum(idfs) / len(idfs) if idfs else 0.0)
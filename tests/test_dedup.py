@@ -0,0 +1,42 @@
+# tests/test_dedup.py
+# Near-duplicate chunk elimination at ingest.
+
+from core.dedup import dedup_chunks
+from core.pdf_utils import Chunk
+
+FOOTER = (
+    "This document is the property of the University Registrar. Distribution outside the "
+    "university is prohibited without written permission. All rights reserved {year}."
+)
+
+
+def test_boilerplate_collapses_into_one_chunk_with_all_pages():
+    chunks = [Chunk(id=f"f{p}", text=FOOTER.format(year=2024), page=p, doc="a.pdf") for p in (1, 2, 3)]
+    chunks.append(Chunk(id="f4", text=FOOTER.format(year=2024).upper(), page=4, doc="a.pdf"))
+    chunks.append(Chunk(id="b1", text="Course registration opens on 3 March for all programmes.", page=2, doc="a.pdf"))
+    kept, report = dedup_chunks(chunks)
+    assert [c.id for c in kept] == ["f1", "b1"]
+    assert kept[0].occurrences == [("a.pdf", 1), ("a.pdf", 2), ("a.pdf", 3), ("a.pdf", 4)]
+    assert kept[1].occurrences == []
+    assert (report.total, report.kept, report.removed, report.embedding_calls_saved) == (5, 2, 3, 3)
+
+
+def test_chunks_differing_only_in_a_number_are_kept():
+    table = " ".join(f"Item {name} costs the listed amount per semester for students." for name in "abcdefghijklm")
+    chunks = [
+        Chunk(id="y1", text=f"Fee schedule 2024. {table} Hostel fee: 1200.", page=1, doc="a.pdf"),
+        Chunk(id="y2", text=f"Fee schedule 2024. {table} Hostel fee: 1350.", page=5, doc="a.pdf"),
+    ]
+    kept, report = dedup_chunks(chunks, threshold=0.5)
+    assert [c.id for c in kept] == ["y1", "y2"] and report.removed == 0
+
+
+def test_distinct_chunks_are_kept():
+    texts = [
+        "Machine learning introduces supervised and unsupervised methods for data.",
+        "The library is open from eight in the morning until midnight on weekdays.",
+        "Hostel fees must be paid before the start of each semester at the bursar.",
+    ]
+    chunks = [Chunk(id=str(i), text=t, page=i, doc="b.pdf") for i, t in enumerate(texts)]
+    kept, report = dedup_chunks(chunks)
+    assert len(kept) == 3 and report.removed == 0
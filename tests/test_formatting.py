@@ -0,0 +1,40 @@
+# tests/test_formatting.py
+# Single-pass answer formatting and its streaming (chunked) counterpart.
+
+import random
+
+from core.formatting import StreamingFormatter, prettify_answer, split_outside_parens
+
+NUMBERED = (
+    "Here are the **key points** :\n1. **Fees**: pay by June ; late fee applies\n"
+    "2) Library: open 9-5, closed Sunday, exams extended\n3. Hostel curfew is 10pm"
+)
+
+
+def test_prettify_answer_cases():
+    assert prettify_answer(NUMBERED) == (
+        "Here are the key points:\n\n1. Fees.\n- pay by June.\n- late fee applies.\n"
+        "2. Library.\n- open 9-5.\n- closed Sunday.\n- exams extended.\n3. Hostel curfew is 10pm."
+    )
+    assert prettify_answer("Registration opens in June ,  closes in July..") == \
+        "Registration opens in June, closes in July."
+    assert prettify_answer("* first point * second point") == "- first point.\n- second point."
+    assert prettify_answer("• one • two") == "- one.\n- two."
+    assert split_outside_parens("a (b; c); d;; e", ";") == ["a (b; c)", "d", "e"]
+
+
+def test_streaming_emits_stable_prefixes():
+    rng = random.Random(0)
+    for text in (NUMBERED, NUMBERED.replace("\n", " ") + " ; 4. last , one..", "plain , answer"):
+        fmt, outputs, i = StreamingFormatter(), [], 0
+        while i < len(text):
+            step = rng.randint(1, 5)
+            outputs.append(fmt.feed(text[i:i + step]))
+            i += step
+        final = fmt.finish()
+        assert final == prettify_answer(text)
+        assert all(final.startswith(out) for out in outputs)
+
+    # Items are emitted once the next marker arrives, before the answer is complete.
+    fmt = StreamingFormatter()
+    assert fmt.feed("Steps:\n1. Apply online\n2. Pay the") == "Steps:\n\n1. Apply online."
@@ -0,0 +1,67 @@
+# tests/test_history.py
+# Rolling conversation summary: incremental updates, budget, background compaction.
+
+import time
+
+import core.history as history
+
+
+def _use_tmp_threads(monkeypatch, tmp_path):
+    monkeypatch.setattr(history, "THREADS_PATH", str(tmp_path / "threads.json"))
+    monkeypatch.setattr(history, "_SUMMARY_CACHE", {})
+    monkeypatch.setattr(history, "_compactor", None)
+
+
+def test_summary_updates_incrementally_and_persists(monkeypatch, tmp_path):
+    _use_tmp_threads(monkeypatch, tmp_path)
+    tid = history.create_thread("t", None)
+    history.append_message(tid, "user", "What is the exam\nschedule?")
+    history.append_message(tid, "assistant", "Finals start on May 5.")
+    assert history.conversation_summary_for_prompt(tid) == (
+        "Q: What is the exam schedule? ; A: Finals start on May 5."
+    )
+    # A fresh process rebuilds nothing: the stored summary is reused as-is.
+    monkeypatch.setattr(history, "_SUMMARY_CACHE", {})
+    assert history.get_thread(tid)["summary"]["recent"][0] == "Q: What is the exam schedule?"
+    assert history.conversation_summary_for_prompt(tid).startswith("Q: What is the exam")
+
+
+def test_summary_respects_token_budget(monkeypatch, tmp_path):
+    _use_tmp_threads(monkeypatch, tmp_path)
+    monkeypatch.setattr(history, "SUMMARY_TOKEN_BUDGET", 60)
+    tid = history.create_thread("t", None)
+    for i in range(30):
+        history.append_message(tid, "user", f"question {i} " + "x" * 100)
+    out = history.conversation_summary_for_prompt(tid)
+    assert history._approx_tokens(out) <= 60
+    assert "question 29" in out
+
+
+def test_background_compaction_replaces_folded_turns(monkeypatch, tmp_path):
+    _use_tmp_threads(monkeypatch, tmp_path)
+    monkeypatch.setattr(history, "MAX_SESSION_SUMMARY_TURNS", 2)
+    monkeypatch.setattr(history, "SUMMARY_COMPACT_TRIGGER", 3)
+    history.set_summary_compactor(lambda text: "COMPACTED")
+    tid = history.create_thread("t", None)
+    for i in range(4):
+        history.append_message(tid, "user", f"q{i}")
+    deadline = time.time() + 2
+    while "COMPACTED" not in history.conversation_summary_for_prompt(tid) and time.time() < deadline:
+        time.sleep(0.01)
+    assert history.conversation_summary_for_prompt(tid) == "Earlier: COMPACTED ; Q: q2 ; Q: q3"
+    assert history.get_thread(tid)["summary"]["earlier"] == ["COMPACTED"]
+
+
+def test_compaction_waits_for_folded_text_budget(monkeypatch, tmp_path):
+    _use_tmp_threads(monkeypatch, tmp_path)
+    calls = []
+    history.set_summary_compactor(lambda text: calls.append(text) or "Discussed fees and exams.")
+    tid = history.create_thread("t", None)
+    for i in range(40):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.append_message(tid, role, f"Message {i} about hostel fees and exam dates. " * 4)
+        while tid in history._compacting:
+            time.sleep(0.01)
+    # One compaction per ~SUMMARY_COMPACT_TRIGGER tokens of folded text, not one per turn.
+    assert 0 < len(calls) <= 8
+    assert history.get_thread(tid)["summary"]["earlier"][0] == "Discussed fees and exams."
@@ -0,0 +1,120 @@
+# tests/test_jobs.py
+# Background ingestion: dedup per collection and resume from checkpointed batches.
+
+import os
+
+import faiss
+import fitz
+import numpy as np
+
+import core.embeddings as embeddings
+import core.history as history
+import core.jobs as jobs
+import core.storage as storage
+
+
+class CountingEmb:
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def encode(self, texts, strict=False):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise KeyboardInterrupt("simulated restart")
+        self.calls += 1
+        v = np.random.default_rng(len(texts[0])).random((len(texts), 8)).astype("float32")
+        faiss.normalize_L2(v)
+        return v
+
+
+def _setup(monkeypatch, tmp_path, pages=3):
+    monkeypatch.setattr(jobs, "VS_BASE", str(tmp_path / "vs"))
+    monkeypatch.setattr(jobs, "INGEST_BATCH_SIZE", 1)
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i + 1} text")
+    path = str(tmp_path / "a.pdf")
+    doc.save(path)
+    doc.close()
+    return [("a.pdf", path)]
+
+
+def test_submit_deduplicates_per_collection(monkeypatch, tmp_path):
+    files = _setup(monkeypatch, tmp_path)
+    q = jobs.IngestJobQueue(CountingEmb(), workers=0)
+    first = q.submit("c1", files)
+    second = q.submit("c1", files)
+    assert first["state"] == second["state"] == jobs.QUEUED
+    assert q._queue.qsize() == 1
+
+
+def test_interrupted_job_resumes_from_checkpoint(monkeypatch, tmp_path):
+    files = _setup(monkeypatch, tmp_path)
+    q1 = jobs.IngestJobQueue(CountingEmb(fail_after=1), workers=0)
+    q1.submit("c1", files)
+    try:
+        q1._run(q1._jobs["c1"])
+    except KeyboardInterrupt:
+        pass
+    assert q1.status("c1")["batches_done"] == 1
+
+    emb = CountingEmb()
+    q2 = jobs.IngestJobQueue(emb, workers=1)  # fresh process
+    assert q2.resume_pending() == ["c1"]
+    q2._queue.join()
+    assert emb.calls == 2  # only the batches that were not checkpointed
+    assert q2.status("c1")["state"] == jobs.DONE
+    assert os.path.exists(os.path.join(jobs.VS_BASE, "c1", "index.faiss"))
+    assert not os.path.exists(os.path.join(jobs.VS_BASE, "c1", "_job"))
+
+
+def test_embedding_failure_fails_job_without_checkpointing_zeros(monkeypatch, tmp_path):
+    files = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(jobs, "INGEST_BATCH_SIZE", 2)
+    calls = []
+
+    def embed_content(model, content):
+        calls.append(content)
+        if len(calls) == 2:  # second text of the first batch
+            raise RuntimeError("quota exhausted")
+        return {"embedding": [1.0] * 8}
+
+    monkeypatch.setattr(embeddings.genai, "embed_content", embed_content)
+    q = jobs.IngestJobQueue(embeddings.GeminiEmbedder(), workers=1)
+    q.submit("c1", files)
+    q._queue.join()
+    job = q.status("c1")
+    assert job["state"] == jobs.FAILED and "quota exhausted" in job["error"]
+    assert not os.path.exists(os.path.join(jobs._job_dir("c1"), "emb_00000.npy"))
+
+    q.submit("c1", files)  # retry resumes from the saved chunks
+    q._queue.join()
+    assert q.status("c1")["state"] == jobs.DONE
+    assert os.path.exists(os.path.join(jobs.VS_BASE, "c1", "ingest_report.json"))  # dedup kept across retry
+    index = faiss.read_index(os.path.join(jobs.VS_BASE, "c1", "index.faiss"))
+    vecs = index.reconstruct_n(0, index.ntotal)
+    assert np.all(np.linalg.norm(vecs, axis=1) > 0.99)
+
+
+def test_evicted_index_is_rebuilt_in_the_same_process(monkeypatch, tmp_path):
+    files = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(storage, "VS_BASE", jobs.VS_BASE)
+    monkeypatch.setattr(storage, "BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(storage, "PAGE_CACHE_DIR", str(tmp_path / "pages"))
+    monkeypatch.setattr(history, "THREADS_PATH", str(tmp_path / "threads.json"))
+    with open(files[0][1], "rb") as f:
+        digest, _ = storage.store_upload("a.pdf", f.read())
+    storage.write_manifest("c1", [("a.pdf", digest)])
+    history.create_thread("t", "c1")
+
+    q = jobs.IngestJobQueue(CountingEmb(), workers=1)
+    q.submit("c1", storage.manifest_files("c1"))
+    q._queue.join()
+    assert q.status("c1")["state"] == jobs.DONE
+
+    assert storage.enforce_quota(quota_bytes=1, grace_s=0) == ["c1"]
+    assert q.status("c1") is None
+    assert q.submit("c1", storage.manifest_files("c1"))["state"] == jobs.QUEUED
+    q._queue.join()
+    assert q.status("c1")["state"] == jobs.DONE
+    assert jobs._index_exists("c1")
@@ -0,0 +1,45 @@
+# tests/test_pdf_utils.py
+# Page rendering goes through the handle pool and the memory/disk caches.
+
+import fitz
+
+import core.pdf_utils as pdf_utils
+import core.storage as storage
+
+
+def _make_pdf(path, pages=2):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i + 1}")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_render_uses_pool_and_caches(monkeypatch, tmp_path):
+    uploads, cache = tmp_path / "uploads", tmp_path / "cache"
+    uploads.mkdir()
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(uploads))
+    monkeypatch.setattr(pdf_utils, "PAGE_CACHE_DIR", str(cache))
+    monkeypatch.setattr(pdf_utils, "_PAGE_CACHE", pdf_utils.OrderedDict())
+    _make_pdf(uploads / "a.pdf")
+
+    opened = []
+    real_open = fitz.open
+    monkeypatch.setattr(pdf_utils.fitz, "open", lambda *a, **k: opened.append(a) or real_open(*a, **k))
+
+    first = pdf_utils.render_pdf_page_image("a.pdf", 1)
+    second = pdf_utils.render_pdf_page_image("a.pdf", 2)
+    assert first and first.startswith(b"\x89PNG") and second
+    assert len(opened) == 1  # both pages rendered from one pooled handle
+    assert len(list(cache.iterdir())) == 2
+
+    # Memory cache dropped: the disk cache still avoids re-rendering.
+    pdf_utils._PAGE_CACHE.clear()
+    pdf_utils._HANDLES.clear()
+    assert pdf_utils.render_pdf_page_image("a.pdf", 1) == first
+    assert len(opened) == 1
+
+
+def test_missing_document_returns_none(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "UPLOAD_DIR", str(tmp_path))
+    assert pdf_utils.render_pdf_page_image("nope.pdf", 1) is None
@@ -0,0 +1,102 @@
+# tests/test_router.py
+# Local query routing from collection statistics, without remote calls.
+
+import json
+
+import faiss
+import numpy as np
+
+import core.router as router
+from core.pdf_utils import Chunk
+from core.vector_store import VectorStore
+
+
+class CountingEmb:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        v = np.stack([np.random.default_rng(abs(hash(t)) % 10**6).random(16).astype("float32") for t in texts])
+        faiss.normalize_L2(v)
+        return v
+
+
+def _store():
+    vs = VectorStore(CountingEmb())
+    vs.build([
+        Chunk(id="c1", text="Hostel fees are due before the semester starts.", page=1, doc="a.pdf"),
+        Chunk(id="c2", text="The library closes at midnight during exams.", page=2, doc="a.pdf"),
+    ])
+    vs.embedder.calls = 0
+    return vs
+
+
+def test_routes_without_remote_calls_and_logs(monkeypatch, tmp_path):
+    log = tmp_path / "router.jsonl"
+    monkeypatch.setattr(router, "ROUTER_LOG_PATH", str(log))
+    vs = _store()
+
+    assert router.route_query("When are hostel fees due?", vs).route == router.GROUNDED
+    assert router.route_query("Who won the football world cup?", vs).route == router.GENERAL
+    assert router.route_query("anything", None).route == router.GENERAL
+    assert vs.embedder.calls == 0
+
+    decision = router.route_query("library closes", vs)
+    router.record_outcome(decision, "grounded_answered", top_dense=0.8)
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert [r["type"] for r in records] == ["decision"] * 4 + ["outcome"]
+    assert records[-1]["id"] == records[-2]["id"]
+    assert records[0]["features"]["idf_coverage"] == 1.0
+
+
+def test_cached_query_embedding_score_drives_route(monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "ROUTER_LOG_PATH", str(tmp_path / "router.jsonl"))
+    vs = _store()
+    q = "hostel fees semester"
+    vs.search_hybrid(q)
+    assert vs.embedder.calls == 1
+    monkeypatch.setattr(router, "ROUTER_EXTRACTIVE_SCORE", -1.0)
+    decision = router.route_query(q, vs)
+    assert decision.route == router.GROUNDED  # extractive route is off by default
+    assert decision.features["extractive_candidate"] == 1.0
+    monkeypatch.setattr(router, "ROUTER_EXTRACTIVE_ENABLED", True)
+    assert router.route_query(q, vs).route == router.EXTRACTIVE
+    vs.top_dense_score(q)
+    assert vs.embedder.calls == 1  # reused, not re-embedded
+
+
+def test_failed_query_embedding_is_not_cached(monkeypatch):
+    vs = _store()
+    real_encode = vs.embedder.encode
+    monkeypatch.setattr(vs.embedder, "encode", lambda texts: np.zeros((1, 16), dtype="float32"))
+    vs.top_dense_score("hostel fees")
+    assert vs.cached_top_dense_score("hostel fees") is None
+    monkeypatch.setattr(vs.embedder, "encode", real_encode)
+    vs.top_dense_score("hostel fees")
+    assert vs.cached_top_dense_score("hostel fees") is not None
+
+
+def test_query_terms_match_vocabulary_across_punctuation(monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "ROUTER_LOG_PATH", str(tmp_path / "router.jsonl"))
+    vs = VectorStore(CountingEmb())
+    vs.build([Chunk(id="c1", text="Contact the university's registrar by e-mail.", page=1, doc="a.pdf")])
+    assert router.query_terms("What is the University's e-mail?") == ["universitys", "email"]
+    decision = router.route_query("Can I contact the university's registrar by e-mail", vs)
+    assert decision.features["idf_coverage"] == 1.0
+    assert decision.route == router.GROUNDED
+
+
+def test_cached_score_never_embeds_even_if_evicted_meanwhile(monkeypatch):
+    vs = _store()
+    vs.top_dense_score("hostel fees")
+    real_get = vs._cached_query_vec
+
+    def get_then_evict(q):
+        vec = real_get(q)
+        vs._qcache.clear()  # another session evicts q right after the lookup
+        return vec
+
+    monkeypatch.setattr(vs, "_cached_query_vec", get_then_evict)
+    assert vs.cached_top_dense_score("hostel fees") is not None
+    assert vs.embedder.calls == 1
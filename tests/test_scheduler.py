@@ -0,0 +1,79 @@
+# tests/test_scheduler.py
+# Gemini request scheduler against a local fake API server (no network, no quota).
+
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.scheduler import BULK, INTERACTIVE, GeminiScheduler
+
+
+class FakeGemini(BaseHTTPRequestHandler):
+    throttle_first = 0
+    calls = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.calls += 1
+        status = 429 if cls.calls <= cls.throttle_first else 200
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b"ok" if status == 200 else b"quota")
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(throttle_first):
+    handler = type("Handler", (FakeGemini,), {"throttle_first": throttle_first, "calls": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def test_retries_429_and_backs_off_concurrency():
+    server, handler, url = _serve(throttle_first=2)
+    try:
+        sched = GeminiScheduler(rpm={}, default_rpm=6000, max_concurrency=8, backoff_s=0.01)
+        body = sched.run("m", lambda: urllib.request.urlopen(url).read())
+        assert body == b"ok"
+        assert handler.calls == 3
+        stats = sched.stats()["m"]
+        assert stats["throttled"] == 2
+        assert stats["concurrency_limit"] < 8
+        assert stats["requests"] == 3
+    finally:
+        server.shutdown()
+
+
+def test_token_bucket_limits_rate():
+    sched = GeminiScheduler(rpm={"m": 600}, max_concurrency=4)  # 10/s, burst 10
+    start = time.monotonic()
+    for _ in range(15):
+        sched.run("m", lambda: None)
+    assert time.monotonic() - start >= 0.4
+
+
+def test_interactive_requests_jump_the_bulk_queue():
+    sched = GeminiScheduler(rpm={}, default_rpm=60000, max_concurrency=1)
+    gate, order = threading.Event(), []
+
+    def call(tag):
+        order.append(tag)
+
+    holder = threading.Thread(target=sched.run, args=("m", gate.wait))
+    holder.start()
+    while sched.stats().get("m", {}).get("inflight") != 1:
+        time.sleep(0.001)
+    workers = [threading.Thread(target=sched.run, args=("m", lambda i=i: call(f"bulk{i}"), BULK)) for i in range(3)]
+    workers.append(threading.Thread(target=sched.run, args=("m", lambda: call("interactive"), INTERACTIVE)))
+    for w in workers:
+        w.start()
+    while sum(sched.stats()["m"]["queue_depth"].values()) != 4:
+        time.sleep(0.001)
+    gate.set()
+    for w in [holder] + workers:
+        w.join(timeout=5)
+    assert order[0] == "interactive"
+    assert sorted(order[1:]) == ["bulk0", "bulk1", "bulk2"]
@@ -0,0 +1,100 @@
+# tests/test_storage.py
+# Content-addressed uploads, collection refcounts, orphan GC and quota eviction.
+
+import json
+import os
+
+import core.history as history
+import core.storage as storage
+from core.config import collection_id_from_blobs
+
+
+def _setup(monkeypatch, tmp_path):
+    for name, sub in (("VS_BASE", "vs"), ("BLOB_DIR", "blobs"), ("PAGE_CACHE_DIR", "pages"), ("UPLOAD_DIR", "up")):
+        monkeypatch.setattr(storage, name, str(tmp_path / sub))
+    monkeypatch.setattr(history, "THREADS_PATH", str(tmp_path / "threads.json"))
+
+
+def _collection(cid, blobs, index_bytes=0):
+    storage.write_manifest(cid, blobs)
+    for name in storage.INDEX_FILES:
+        with open(os.path.join(storage.VS_BASE, cid, name), "wb") as f:
+            f.write(b"x" * index_bytes)
+
+
+def test_identical_uploads_stored_once_and_resolved_by_collection(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    d1, p1 = storage.store_upload("a.pdf", b"%PDF same")
+    d2, p2 = storage.store_upload("renamed.pdf", b"%PDF same")
+    d3, _ = storage.store_upload("a.pdf", b"%PDF other user")
+    assert (d1, p1) == (d2, p2) and d3 != d1
+    assert len(os.listdir(storage.BLOB_DIR)) == 2
+    storage.write_manifest("c1", [("a.pdf", d3)])
+    assert storage.resolve_doc_path("a.pdf", "c1") == storage._blob_path(d3)
+    assert storage.resolve_doc_path("a.pdf") == os.path.join(storage.UPLOAD_DIR, "a.pdf")
+    # same name and size, different content: separate collections
+    assert collection_id_from_blobs([("a.pdf", d1)]) != collection_id_from_blobs([("a.pdf", d3)])
+    assert collection_id_from_blobs([("a", d1), ("b", d3)]) == collection_id_from_blobs([("b", d3), ("a", d1)])
+
+
+def test_gc_removes_unreferenced_collections_and_blobs(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    keep, _ = storage.store_upload("k.pdf", b"keep")
+    drop, _ = storage.store_upload("d.pdf", b"drop")
+    _collection("kept", [("k.pdf", keep)])
+    _collection("orphan", [("d.pdf", drop)])
+    history.create_thread("t", "kept")
+    assert storage.collection_refcounts() == {"kept": 1}
+    assert storage.gc_orphans(grace_s=3600) == {"collections": 0, "blobs": 0}  # still fresh
+    assert storage.gc_orphans(grace_s=0) == {"collections": 1, "blobs": 1}
+    assert os.listdir(storage.VS_BASE) == ["kept"]
+    assert os.listdir(storage.BLOB_DIR) == [f"{keep}.pdf"]
+
+
+def test_quota_evicts_least_recently_used_cold_collections(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    a, _ = storage.store_upload("a.pdf", b"a")
+    b, _ = storage.store_upload("b.pdf", b"b")
+    _collection("old", [("a.pdf", a)], index_bytes=1000)
+    _collection("new", [("b.pdf", b)], index_bytes=1000)
+    history.create_thread("t1", "old")
+    history.create_thread("t2", "new")
+    os.utime(os.path.join(storage.VS_BASE, "old", ".last_used"), (1, 1))
+    evicted = storage.enforce_quota(quota_bytes=3000, grace_s=0)
+    assert evicted == ["old"]
+    usage = {u["collection_id"]: u for u in storage.disk_usage()}
+    assert not usage["old"]["indexed"] and usage["new"]["indexed"]
+    assert storage.manifest_files("old") == [("a.pdf", storage._blob_path(a))]  # rebuildable
+
+
+def test_only_queued_or_running_jobs_protect_a_collection(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    for cid, state in (("failed", "failed"), ("running", "running")):
+        _collection(cid, [])
+        os.makedirs(os.path.join(storage.VS_BASE, cid, "_job"))
+        with open(os.path.join(storage.VS_BASE, cid, "_job", "job.json"), "w") as f:
+            json.dump({"collection_id": cid, "state": state}, f)
+    assert storage.gc_orphans(grace_s=0)["collections"] == 1
+    assert os.listdir(storage.VS_BASE) == ["running"]
+
+
+def test_unreadable_threads_file_aborts_gc_and_eviction(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    d, _ = storage.store_upload("a.pdf", b"a")
+    _collection("c1", [("a.pdf", d)], index_bytes=1000)
+    history.create_thread("t", "c1")
+    with open(history.THREADS_PATH, "r+", encoding="utf-8") as f:
+        f.truncate(10)  # e.g. read while another writer was mid-write
+    assert storage.gc_orphans(grace_s=0) == {"collections": 0, "blobs": 0}
+    assert storage.enforce_quota(quota_bytes=1, grace_s=0) == []
+    assert os.listdir(storage.VS_BASE) == ["c1"] and os.listdir(storage.BLOB_DIR) == [f"{d}.pdf"]
+
+
+def test_quota_skips_in_flight_page_renders(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    os.makedirs(storage.PAGE_CACHE_DIR)
+    for name in ("p1.png", "p2.png.123.tmp"):
+        with open(os.path.join(storage.PAGE_CACHE_DIR, name), "wb") as f:
+            f.write(b"x" * 100)
+    storage.enforce_quota(quota_bytes=1, grace_s=0)
+    assert os.listdir(storage.PAGE_CACHE_DIR) == ["p2.png.123.tmp"]